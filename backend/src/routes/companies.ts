@@ -79,12 +79,33 @@ router.get('/analyze/:ticker/status', async (req: Request, res: Response) => {
 
     // Check in-memory job status for errors
     const job = getJobByTicker(ticker);
+
+    // The worker answered with an expired analysis and is refreshing it;
+    // serve that one rather than keep the user waiting
+    if (job?.status === 'complete' && job.stale) {
+      const staleRows = await query(
+        `SELECT a.*, c.industry, c.market_cap FROM company_analyses a
+         LEFT JOIN companies c ON a.company_ticker = c.ticker
+         WHERE a.company_ticker = ?
+         ORDER BY a.analyzed_at DESC LIMIT 1`,
+        [ticker]
+      );
+      if (staleRows.length) {
+        res.json({
+          status: 'complete',
+          stale: true,
+          refreshError: job.refreshError,
+          result: formatAnalysis(staleRows[0]),
+        });
+        return;
+      }
+    }
     if (job?.status === 'error') {
       res.json({ status: 'error', error: job.error || 'Analysis failed' });
       return;
     }
 
-    res.json({ status: 'processing' });
+    res.json({ status: 'processing', stage: job?.stage ?? null });
   } catch (err) {
     console.error('[companies] GET /analyze/:ticker/status error:', err);
     // If Snowflake query fails, check job status as fallback
@@ -1,6 +1,6 @@
 import { Router, Request, Response } from 'express';
 import { query } from '../services/snowflake';
-import { startAnalysis } from '../services/analysis';
+import { startBatchAnalysis } from '../services/analysis';
 
 const router = Router();
 
@@ -573,15 +573,13 @@ router.post('/profile/:customerId/analyze-all', async (req: Request, res: Respon
     }
 
     // Trigger analysis for unanalyzed tickers
-    const triggered: string[] = [];
-    for (const ticker of tickersArray) {
-      if (!alreadyAnalyzed.has(ticker)) {
-        try {
-          startAnalysis(ticker);
-          triggered.push(ticker);
-        } catch (err) {
-          console.error(`[Nessie] Failed to trigger analysis for ${ticker}:`, err);
-        }
+    let triggered = tickersArray.filter((ticker) => !alreadyAnalyzed.has(ticker));
+    if (triggered.length > 0) {
+      try {
+        startBatchAnalysis(triggered);
+      } catch (err) {
+        console.error(`[Nessie] Failed to trigger analysis for ${triggered.join(',')}:`, err);
+        triggered = [];
       }
     }
 
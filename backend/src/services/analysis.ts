@@ -1,22 +1,112 @@
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
+import readline from 'readline';
 
 interface Job {
+  id?: string;
   status: 'processing' | 'complete' | 'error';
   startedAt: Date;
   ticker: string;
+  stage?: string;
   error?: string;
+  // Served an expired analysis while the worker refreshes it in the background
+  stale?: boolean;
+  // Set when that background refresh failed; the expired analysis stays served
+  refreshError?: string;
 }
 
 // Track jobs by ticker so status endpoint can look them up
 const jobsByTicker = new Map<string, Job>();
 
+const ingestionDir = path.resolve(__dirname, '../../../ingestion');
+const USE_WORKER = process.env.INGESTION_WORKER !== 'false';
+
+// A single long-lived `worker.py` keeps Python imports and the Snowflake
+// session warm. Jobs go in as JSON lines on stdin; progress comes back as
+// JSON lines on stdout.
+let worker: ChildProcessWithoutNullStreams | null = null;
+const jobsById = new Map<string, Job>();
+
+function failWorkerJobs(error: string) {
+  for (const job of jobsById.values()) {
+    job.status = 'error';
+    job.error = error;
+  }
+  jobsById.clear();
+}
+
+function getWorker(): ChildProcessWithoutNullStreams {
+  if (worker) return worker;
+
+  const proc = spawn('python3', ['worker.py'], { cwd: ingestionDir });
+  worker = proc;
+
+  let stderr = '';
+  proc.stderr.on('data', (d) => {
+    const msg = d.toString();
+    stderr = (stderr + msg).slice(-2000);
+    console.error(`[worker] ${msg}`);
+  });
+
+  readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+    let msg: any;
+    try {
+      msg = JSON.parse(line);
+    } catch {
+      console.log(`[worker] ${line}`);
+      return;
+    }
+    if (msg.event === 'refreshed') {
+      // Later stale requests join the refresh already running, so the event
+      // carries the first job's id; it settles whichever job is current
+      const j = jobsByTicker.get(msg.ticker);
+      if (j?.stale) {
+        if (msg.ok) {
+          j.stale = false;
+          j.refreshError = undefined;
+        } else {
+          j.refreshError = msg.error || 'Refresh failed';
+        }
+      }
+      return;
+    }
+    const job = msg.id ? jobsById.get(msg.id) : undefined;
+    if (!job) return;
+    if (msg.event === 'stage') {
+      job.stage = msg.stage;
+    } else if (msg.event === 'done') {
+      job.status = 'complete';
+      job.stage = undefined;
+      job.stale = Boolean(msg.stale);
+      jobsById.delete(msg.id);
+    } else if (msg.event === 'error') {
+      job.status = 'error';
+      job.error = msg.error || 'Analysis failed';
+      jobsById.delete(msg.id);
+    }
+  });
+
+  const onExit = (reason: string) => {
+    if (worker === proc) worker = null;
+    failWorkerJobs(stderr.slice(-500) || reason);
+  };
+  proc.on('close', (code) => onExit(`Worker exited with code ${code}`));
+  proc.on('error', (err) => onExit(err.message));
+
+  return proc;
+}
+
 export function startAnalysis(ticker: string): string {
   const jobId = `${ticker}-${Date.now()}`;
-  const job: Job = { status: 'processing', startedAt: new Date(), ticker };
+  const job: Job = { id: jobId, status: 'processing', startedAt: new Date(), ticker };
   jobsByTicker.set(ticker, job);
 
-  const ingestionDir = path.resolve(__dirname, '../../../ingestion');
+  if (USE_WORKER) {
+    jobsById.set(jobId, job);
+    getWorker().stdin.write(JSON.stringify({ id: jobId, ticker }) + '\n');
+    return jobId;
+  }
+
   const proc = spawn('python3', ['run.py', '--ticker', ticker], { cwd: ingestionDir });
 
   let stderr = '';
@@ -50,6 +140,66 @@ export function startAnalysis(ticker: string): string {
   return jobId;
 }
 
+// Runs a whole portfolio through one pipelined `run.py --tickers` process
+// instead of spawning a process per ticker.
+export function startBatchAnalysis(tickers: string[]): string {
+  const jobId = `batch-${Date.now()}`;
+  const startedAt = new Date();
+  for (const ticker of tickers) {
+    jobsByTicker.set(ticker, { status: 'processing', startedAt, ticker });
+  }
+
+  const proc = spawn('python3', ['run.py', '--tickers', tickers.join(','), '--json-results'], { cwd: ingestionDir });
+
+  // run.py exits 0 even when some tickers fail, so each job takes its status
+  // from the ticker's result line; the exit code only covers the rest
+  const reported = new Set<string>();
+  let stderr = '';
+  readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+    console.log(`[${jobId}] ${line}`);
+    const at = line.indexOf('{"event"');
+    if (at < 0) return;
+    let msg: any;
+    try {
+      msg = JSON.parse(line.slice(at));
+    } catch {
+      return;
+    }
+    if (msg.event !== 'done') return;
+    const ticker = tickers.find((t) => t.toUpperCase() === msg.ticker);
+    const j = ticker && jobsByTicker.get(ticker);
+    if (!ticker || !j || j.startedAt !== startedAt) return;
+    reported.add(ticker);
+    if (msg.ok) {
+      j.status = 'complete';
+    } else {
+      j.status = 'error';
+      j.error = 'Scrape or analysis failed';
+    }
+  });
+  proc.stderr.on('data', (d) => {
+    const msg = d.toString();
+    stderr += msg;
+    console.error(`[${jobId}] ${msg}`);
+  });
+
+  const finish = (error?: string) => {
+    for (const ticker of tickers) {
+      const j = jobsByTicker.get(ticker);
+      if (!j || j.startedAt !== startedAt || reported.has(ticker)) continue;
+      j.status = 'error';
+      j.error = error || 'No result reported for this ticker';
+    }
+  };
+
+  proc.on('close', (code) => {
+    finish(code === 0 ? undefined : stderr.slice(-500) || `Process exited with code ${code}`);
+  });
+  proc.on('error', (err) => finish(err.message));
+
+  return jobId;
+}
+
 export function getJobByTicker(ticker: string): Job | null {
   return jobsByTicker.get(ticker) || null;
 }
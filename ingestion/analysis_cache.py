@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+# How long a locally held result is trusted before company_analyses is asked
+# again (another process may have refreshed it). Never past its expires_at.
+LOCAL_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+# Expired analyses younger than this are served (flagged stale) while a
+# refresh runs in the background; older ones are re-analyzed inline.
+STALE_MAX = float(os.getenv("ANALYSIS_STALE_MAX_DAYS", "30")) * 86400
+REFRESH_WORKERS = int(os.getenv("ANALYSIS_REFRESH_WORKERS", "1"))
+
+
+class AnalysisCache:
+    def __init__(self, lookup, max_entries: int = CACHE_SIZE, ttl: float = LOCAL_TTL,
+                 stale_max: float = STALE_MAX, refresh_workers: int = REFRESH_WORKERS):
+        # lookup(ticker) -> (analysis, expires_at as epoch seconds) or None
+        self._lookup = lookup
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_max = stale_max
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[dict, float, float]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, refresh_workers), thread_name_prefix="refresh")
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.refreshes = 0
+
+    def _local(self, ticker: str):
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or time.time() - entry[2] > self.ttl:
+                return None
+            self._entries.move_to_end(ticker)
+            return entry
+
+    def _put(self, ticker: str, analysis: dict, expires_at: float):
+        with self._lock:
+            self._entries[ticker] = (analysis, expires_at, time.time())
+            self._entries.move_to_end(ticker)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ticker: str):
+        with self._lock:
+            self._entries.pop(ticker, None)
+
+    def _run(self, ticker: str, refresh) -> tuple:
+        # One refresh per ticker at a time; later callers share its future
+        with self._lock:
+            future = self._inflight.get(ticker)
+            if future is not None:
+                return future, None
+            future = self._inflight[ticker] = Future()
+            self.refreshes += 1
+
+        def work():
+            try:
+                future.set_result(refresh())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.invalidate(ticker)
+                with self._lock:
+                    self._inflight.pop(ticker, None)
+        return future, work
+
+    def get_or_refresh(self, ticker: str, refresh, background_refresh=None) -> tuple[dict | None, bool]:
+        # Returns (analysis, stale). refresh runs inline on a miss;
+        # background_refresh (default: refresh) runs on the refresh pool when a
+        # stale result is served.
+        entry = self._local(ticker)
+        if entry is None:
+            found = self._lookup(ticker)
+            if found:
+                self._put(ticker, *found)
+                entry = self._local(ticker)
+
+        now = time.time()
+        if entry and now < entry[1]:
+            with self._lock:
+                self.hits += 1
+            return entry[0], False
+        if entry and now - entry[1] < self.stale_max:
+            with self._lock:
+                self.stale += 1
+            _, work = self._run(ticker, background_refresh or refresh)
+            if work:
+                self._executor.submit(work)
+            return entry[0], True
+
+        with self._lock:
+            self.misses += 1
+        future, work = self._run(ticker, refresh)
+        if work:
+            work()
+        return future.result(), False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "stale": self.stale, "refreshes": self.refreshes}
@@ -1,14 +1,34 @@
 import json
-import snowflake.connector
 import os
+import time
+import uuid
 from dotenv import load_dotenv
-from loader import get_connection
+import dedup
+from loader import connection
 
 load_dotenv()
 
+SEARCH_SERVICE = "hera_doc_search"
+MODEL = "claude-4-sonnet"
+INDEX_MAX_WAIT = float(os.getenv("CORTEX_INDEX_MAX_WAIT", "3"))
+CONTEXT_DOCS = 20
+# Over-fetch so that collapsing syndicated copies still leaves a full context
+FETCH_DOCS = CONTEXT_DOCS * 2
+# Prompt budget for the documents section. Tokens are estimated at ~4
+# characters each, which is close enough for English prose to keep COMPLETE
+# cost and latency predictable.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+CHARS_PER_TOKEN = 4
+MIN_DOC_TOKENS = 100
+
 HIGH_AUTHORITY = {"sec_8k", "sec_10k", "sec_proxy", "court_opinion"}
 MEDIUM_AUTHORITY = {"news_article", "eeoc_release"}
 LOW_AUTHORITY = {"reddit_post", "glassdoor_proxy", "social_news", "wikipedia"}
+AUTHORITY_WEIGHT = {**{t: 3.0 for t in HIGH_AUTHORITY}, **{t: 2.0 for t in MEDIUM_AUTHORITY}, **{t: 1.0 for t in LOW_AUTHORITY}}
+RELEVANCE_TERMS = [
+    "harassment", "discrimination", "retaliation", "assault", "hostile work environment", "pay gap",
+    "settlement", "lawsuit", "eeoc", "misconduct", "title vii", "wrongful termination",
+]
 
 ANALYSIS_PROMPT = """You are analyzing workplace accountability for {company_name} ({ticker}).
 
@@ -75,105 +95,264 @@ If the documents contain no relevant workplace accountability issues, return a s
 Keep your response under 4000 tokens."""
 
 
-def _get_sentiment(cur, ticker: str) -> tuple[float, int]:
+def _query_async(conn, sql: str, params=None):
+    # Submits the query and returns at once; the returned function blocks
+    # until the rows are ready. Errors surface when the rows are asked for.
+    cur = conn.cursor()
     try:
-        cur.execute("""
-            SELECT AVG(SNOWFLAKE.CORTEX.SENTIMENT(content)) as avg_sent, COUNT(*) as cnt
-            FROM raw_documents
-            WHERE company_ticker = %s AND source_type = 'reddit_post'
-              AND content IS NOT NULL AND LENGTH(content) > 50
-        """, (ticker,))
-        row = cur.fetchone()
-        if row and row[0] is not None:
-            return round(float(row[0]), 3), int(row[1])
+        cur.execute_async(sql, params)
+    except Exception as e:
+        error = e
+
+        def failed():
+            raise error
+        return failed
+
+    def rows():
+        cur.get_results_from_sfqid(cur.sfqid)
+        return cur.fetchall()
+    return rows
+
+
+def _start_sentiment(conn, ticker: str):
+    # Posts are scored once at load time (loader.score_sentiment); only rows
+    # from before the sentiment column was backfilled are scored here.
+    return _query_async(conn, """
+        SELECT AVG(CASE WHEN sentiment IS NULL THEN SNOWFLAKE.CORTEX.SENTIMENT(content) ELSE sentiment END) as avg_sent,
+               COUNT(*) as cnt
+        FROM raw_documents
+        WHERE company_ticker = %s AND source_type = 'reddit_post'
+          AND content IS NOT NULL AND LENGTH(content) > 50
+    """, (ticker,))
+
+
+def _get_sentiment(pending) -> tuple[float, int]:
+    try:
+        rows = pending()
+        if rows and rows[0][0] is not None:
+            return round(float(rows[0][0]), 3), int(rows[0][1])
     except Exception as e:
         print(f"  Sentiment query failed (non-critical): {e}")
     return 0.0, 0
 
 
-def _get_source_types(cur, ticker: str) -> list[str]:
+def _start_source_types(conn, ticker: str):
+    return _query_async(conn, "SELECT DISTINCT source_type FROM raw_documents WHERE company_ticker = %s", (ticker,))
+
+
+def _get_source_types(pending) -> list[str]:
     try:
-        cur.execute(
-            "SELECT DISTINCT source_type FROM raw_documents WHERE company_ticker = %s",
-            (ticker,)
-        )
-        return [row[0] for row in cur.fetchall()]
+        return [row[0] for row in pending()]
     except Exception:
         return []
 
 
-def analyze(ticker: str, company_name: str) -> dict | None:
-    conn = get_connection()
-    try:
+def _search_preview(cur, request: dict) -> list[dict]:
+    # SEARCH_PREVIEW only accepts a string literal, so the request can't be a
+    # bind parameter; escape it for a single-quoted Snowflake string instead.
+    literal = json.dumps(request).replace("\\", "\\\\").replace("'", "\\'")
+    cur.execute(f"""
+        SELECT PARSE_JSON(
+            SNOWFLAKE.CORTEX.SEARCH_PREVIEW('{SEARCH_SERVICE}', '{literal}')
+        )['results'] as results
+    """)
+    row = cur.fetchone()
+    if not row or not row[0]:
+        return []
+    return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+
+def search_index_ready(ticker: str, source_urls: list[str], max_wait: float = INDEX_MAX_WAIT) -> bool:
+    # hera_doc_search refreshes on a TARGET_LAG, so a fixed sleep is either
+    # wasted or too short. Poll for the just-loaded URLs with a short backoff
+    # and let the caller fall back to raw_documents if they aren't there yet.
+    urls = sorted({u for u in source_urls if u})
+    if not urls:
+        return True
+    request = {
+        "query": ticker,
+        "columns": ["source_url"],
+        "filter": {"@and": [
+            {"@eq": {"company_ticker": ticker}},
+            {"@or": [{"@eq": {"source_url": u}} for u in urls]},
+        ]},
+        "limit": min(1000, len(urls) * 2),
+    }
+    deadline = time.monotonic() + max_wait
+    delay = 0.5
+    while True:
+        try:
+            # Check a session out per poll so waiting doesn't pin one
+            with connection() as conn:
+                found = {r.get("source_url") for r in _search_preview(conn.cursor(), request)}
+            if found.issuperset(urls):
+                return True
+        except Exception as e:
+            print(f"  Cortex Search readiness check failed: {e}")
+            return False
+        if time.monotonic() + delay > deadline:
+            print(f"  Cortex Search has {len(found & set(urls))}/{len(urls)} new documents indexed")
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 4)
+
+
+def latest_analysis(ticker: str, conn=None) -> tuple[dict, float] | None:
+    # Newest analysis whether or not it has expired, with its expiry as epoch
+    # seconds. expires_at is TIMESTAMP_NTZ in the session's time zone, so the
+    # remaining lifetime is measured in Snowflake rather than compared here.
+    with connection(conn) as conn:
         cur = conn.cursor()
-        cur.execute(
-            "SELECT * FROM company_analyses WHERE company_ticker = %s AND expires_at > CURRENT_TIMESTAMP() ORDER BY analyzed_at DESC LIMIT 1",
-            (ticker,)
-        )
+        cur.execute("""
+            SELECT *, DATEDIFF('second', CURRENT_TIMESTAMP(), expires_at) AS expires_in
+            FROM company_analyses
+            WHERE company_ticker = %s
+            ORDER BY analyzed_at DESC LIMIT 1
+        """, (ticker,))
         row = cur.fetchone()
-        if row:
-            print(f"  Using cached analysis for {ticker}")
-            return _row_to_dict(cur.description, row)
-
-        # Query Cortex Search (may not be ready if freshly created)
-        docs_text = ""
-        results = None
+        if not row:
+            return None
+        analysis = _row_to_dict(cur.description, row)
+        return analysis, time.time() + float(analysis.pop("expires_in") or 0)
+
+
+def _cached_analysis(cur, ticker: str) -> dict | None:
+    cur.execute(
+        "SELECT * FROM company_analyses WHERE company_ticker = %s AND expires_at > CURRENT_TIMESTAMP() ORDER BY analyzed_at DESC LIMIT 1",
+        (ticker,)
+    )
+    row = cur.fetchone()
+    return _row_to_dict(cur.description, row) if row else None
+
+
+def _build_prompt(conn, ticker: str, company_name: str, use_search: bool = True) -> dict | None:
+    cur = conn.cursor()
+    # Sentiment and source types don't depend on which documents are
+    # picked, so they run in the warehouse while search and packing happen
+    pending_sentiment = _start_sentiment(conn, ticker)
+    pending_source_types = _start_source_types(conn, ticker)
+
+    # Query Cortex Search (may not be ready if freshly created)
+    docs_text = ""
+    results = None
+    if use_search:
         try:
-            cur.execute(f"""
-                SELECT PARSE_JSON(
-                    SNOWFLAKE.CORTEX.SEARCH_PREVIEW(
-                        'hera_doc_search',
-                        '{{"query": "{company_name} workplace harassment discrimination", "columns": ["content", "company_ticker", "source_type", "title", "source_url"], "filter": {{"@eq": {{"company_ticker": "{ticker}"}}}}, "limit": 20}}'
-                    )
-                )['results'] as results
-            """)
-            search_results = cur.fetchone()
-
-            if search_results and search_results[0]:
-                results = json.loads(search_results[0]) if isinstance(search_results[0], str) else search_results[0]
-                docs_text = _format_docs(results)
+            results = _search_preview(cur, {
+                "query": f"{company_name} workplace harassment discrimination",
+                "columns": ["content", "company_ticker", "source_type", "title", "source_url"],
+                "filter": {"@eq": {"company_ticker": ticker}},
+                "limit": FETCH_DOCS,
+            })
+            if results:
+                docs_text, results = _pack_docs(dedup.dedupe(results))
         except Exception as e:
             print(f"  Cortex Search query failed (may not be ready): {e}")
 
-        # Fallback: raw_documents
-        if not docs_text:
+    # Fallback: raw_documents
+    if not docs_text:
+        if use_search:
             print(f"  No results from Cortex Search for {ticker}, trying raw_documents...")
-            cur.execute("""
-                SELECT content, company_ticker, source_type, title, source_url, document_date
-                FROM raw_documents
-                WHERE company_ticker = %s AND content IS NOT NULL AND LENGTH(content) > 50
-                ORDER BY document_date DESC NULLS LAST
-                LIMIT 20
-            """, (ticker,))
-            rows = cur.fetchall()
-            if rows:
-                colnames = [d[0].lower() for d in cur.description]
-                results = [dict(zip(colnames, row)) for row in rows]
-                docs_text = _format_docs(results)
-                print(f"  Using {len(results)} documents from raw_documents")
-            if not docs_text:
-                print(f"  No documents found for {ticker}")
-                return None
+        else:
+            print(f"  Search index not fresh for {ticker}, reading raw_documents...")
+        cur.execute("""
+            SELECT content, company_ticker, source_type, title, source_url, document_date,
+                   metadata:alternate_sources AS alternate_sources
+            FROM raw_documents
+            WHERE company_ticker = %s AND content IS NOT NULL AND LENGTH(content) > 50
+            ORDER BY document_date DESC NULLS LAST
+            LIMIT %s
+        """, (ticker, FETCH_DOCS))
+        rows = cur.fetchall()
+        if rows:
+            colnames = [d[0].lower() for d in cur.description]
+            results = [dict(zip(colnames, row)) for row in rows]
+            for doc in results:
+                if isinstance(doc.get("alternate_sources"), str):
+                    doc["alternate_sources"] = json.loads(doc["alternate_sources"])
+            docs_text, results = _pack_docs(dedup.dedupe(results))
+            print(f"  Using {len(results)} documents from raw_documents")
+        if not docs_text:
+            print(f"  No documents found for {ticker}")
+            return None
 
-        # Get multi-signal context
-        avg_sentiment, reddit_count = _get_sentiment(cur, ticker)
-        source_types = _get_source_types(cur, ticker)
-        doc_count = len(results) if results else 0
-
-        prompt = ANALYSIS_PROMPT.format(
-            company_name=company_name,
-            ticker=ticker,
-            formatted_docs=docs_text,
-            reddit_count=reddit_count,
-            avg_sentiment=avg_sentiment,
-            source_types=", ".join(source_types) if source_types else "none",
-            doc_count=doc_count,
-        )
+    # Get multi-signal context
+    avg_sentiment, reddit_count = _get_sentiment(pending_sentiment)
+    source_types = _get_source_types(pending_source_types)
+    doc_count = len(results) if results else 0
+
+    prompt = ANALYSIS_PROMPT.format(
+        company_name=company_name,
+        ticker=ticker,
+        formatted_docs=docs_text,
+        reddit_count=reddit_count,
+        avg_sentiment=avg_sentiment,
+        source_types=", ".join(source_types) if source_types else "none",
+        doc_count=doc_count,
+    )
+    return {"prompt": prompt, "source_types": source_types, "doc_count": doc_count}
+
+
+def _fix_prompt(raw: str) -> str:
+    return f"Fix this invalid JSON and return ONLY valid JSON:\n{raw}"
+
+
+def _validate(raw, source_types: list[str]) -> dict | None:
+    analysis = _parse_json(raw)
+    if not isinstance(analysis, dict) or not analysis.get("summary"):
+        return None
+    try:
+        analysis["accountability_score"] = int(analysis["accountability_score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    # Ensure data_quality exists
+    if "data_quality" not in analysis:
+        st_set = set(source_types)
+        if st_set & HIGH_AUTHORITY:
+            analysis["data_quality"] = "high"
+        elif st_set & MEDIUM_AUTHORITY:
+            analysis["data_quality"] = "medium"
+        else:
+            analysis["data_quality"] = "low"
+        analysis["data_quality_detail"] = f"Based on {', '.join(source_types)}" if source_types else "Limited data"
+    return analysis
+
+
+def _analysis_row(ticker: str, company_name: str, analysis: dict, doc_count: int) -> tuple:
+    score_breakdown_full = {
+        **analysis.get("score_breakdown", {}),
+        "data_quality": analysis.get("data_quality", "unknown"),
+        "data_quality_detail": analysis.get("data_quality_detail", ""),
+    }
+    return (
+        ticker, company_name,
+        analysis["accountability_score"],
+        analysis["summary"],
+        json.dumps(analysis.get("issues", [])),
+        json.dumps(analysis.get("response", {})),
+        json.dumps(analysis.get("timeline", [])),
+        json.dumps(score_breakdown_full),
+        json.dumps(analysis.get("sources", [])),
+        doc_count,
+    )
+
+
+def analyze(ticker: str, company_name: str, conn=None, use_search: bool = True) -> dict | None:
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        cached = _cached_analysis(cur, ticker)
+        if cached:
+            print(f"  Using cached analysis for {ticker}")
+            return cached
+
+        built = _build_prompt(conn, ticker, company_name, use_search)
+        if not built:
+            return None
 
         # Call Cortex COMPLETE (simple two-argument form)
         cur.execute(
             "SELECT SNOWFLAKE.CORTEX.COMPLETE(%s, %s) as analysis",
-            ('claude-4-sonnet', prompt)
+            (MODEL, built["prompt"])
         )
         result = cur.fetchone()
         if not result or not result[0]:
@@ -181,74 +360,232 @@ def analyze(ticker: str, company_name: str) -> dict | None:
             return None
 
         raw = result[0]
-        analysis = _parse_json(raw)
+        analysis = _validate(raw, built["source_types"])
         if not analysis:
-            retry_prompt = f"Fix this invalid JSON and return ONLY valid JSON:\n{raw}"
             cur.execute(
                 "SELECT SNOWFLAKE.CORTEX.COMPLETE(%s, %s) as analysis",
-                ('claude-4-sonnet', retry_prompt)
+                (MODEL, _fix_prompt(raw))
             )
             result = cur.fetchone()
-            analysis = _parse_json(result[0]) if result else None
+            analysis = _validate(result[0], built["source_types"]) if result else None
 
         if not analysis:
             print(f"  Failed to parse analysis JSON for {ticker}")
             return None
 
-        # Ensure data_quality exists
-        if "data_quality" not in analysis:
-            st_set = set(source_types)
-            if st_set & HIGH_AUTHORITY:
-                analysis["data_quality"] = "high"
-            elif st_set & MEDIUM_AUTHORITY:
-                analysis["data_quality"] = "medium"
-            else:
-                analysis["data_quality"] = "low"
-            analysis["data_quality_detail"] = f"Based on {', '.join(source_types)}" if source_types else "Limited data"
-
-        # Insert analysis (use SELECT with PARSE_JSON since VALUES clause can't call functions)
-        score_breakdown_full = {
-            **analysis.get("score_breakdown", {}),
-            "data_quality": analysis.get("data_quality", "unknown"),
-            "data_quality_detail": analysis.get("data_quality_detail", ""),
-        }
+        # Insert analysis (use SELECT with PARSE_JSON since VALUES clause can't call functions).
+        # Analysis row and companies upsert go in one multi-statement round
+        # trip, wrapped in a transaction so they land together
         cur.execute("""
+            BEGIN;
             INSERT INTO company_analyses (company_ticker, company_name, accountability_score, summary, issues, response, timeline, score_breakdown, sources, document_count)
-            SELECT %s, %s, %s, %s, PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), %s
-        """, (
-            ticker, company_name,
-            analysis["accountability_score"],
-            analysis["summary"],
-            json.dumps(analysis.get("issues", [])),
-            json.dumps(analysis.get("response", {})),
-            json.dumps(analysis.get("timeline", [])),
-            json.dumps(score_breakdown_full),
-            json.dumps(analysis.get("sources", [])),
-            doc_count,
-        ))
-
-        # Upsert companies
-        cur.execute("""
+            SELECT %s, %s, %s, %s, PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), PARSE_JSON(%s), %s;
             MERGE INTO companies t USING (SELECT %s as ticker, %s as name) s
             ON t.ticker = s.ticker
-            WHEN NOT MATCHED THEN INSERT (ticker, name) VALUES (s.ticker, s.name)
-        """, (ticker, company_name))
-
-        conn.commit()
+            WHEN NOT MATCHED THEN INSERT (ticker, name) VALUES (s.ticker, s.name);
+            COMMIT;
+        """, _analysis_row(ticker, company_name, analysis, built["doc_count"]) + (ticker, company_name), num_statements=4)
         print(f"  Analysis complete for {ticker}: score={analysis['accountability_score']} quality={analysis.get('data_quality')}")
         return analysis
+
+
+def _temp_name(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:12].upper()}"
+
+
+def _temp_table(conn, name: str, columns: list[str], rows: list[tuple]):
+    # Session-scoped table filled with write_pandas, which ships the rows as a
+    # staged file instead of inlining them (prompts run to tens of KB each).
+    # Callers drop it in a finally, since pooled sessions outlive the batch.
+    import pandas as pd
+    from snowflake.connector.pandas_tools import write_pandas
+    conn.cursor().execute(f"CREATE TEMPORARY TABLE {name} ({', '.join(columns)})")
+    df = pd.DataFrame(rows, columns=[c.split()[0].upper() for c in columns])
+    write_pandas(conn, df, name, auto_create_table=False, quote_identifiers=False)
+
+
+def _complete_many(conn, prompts: dict[str, str]) -> dict[str, str]:
+    # One set-based COMPLETE over a staged prompts table: a single statement
+    # compiles and queues once for the whole batch. TRY_COMPLETE returns NULL
+    # for a prompt that fails instead of failing the statement, so one bad
+    # row only costs that ticker.
+    if not prompts:
+        return {}
+    table = _temp_name("ANALYSIS_PROMPTS")
+    cur = conn.cursor()
+    try:
+        _temp_table(conn, table, ["ticker STRING", "prompt TEXT"], list(prompts.items()))
+        cur.execute(f"SELECT ticker, SNOWFLAKE.CORTEX.TRY_COMPLETE(%s, prompt) FROM {table}", (MODEL,))
+        return {ticker: raw for ticker, raw in cur.fetchall() if raw}
     finally:
-        conn.close()
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
 
 
-def _format_docs(docs: list[dict]) -> str:
-    out = ""
-    for i, doc in enumerate(docs):
-        out += f"\n--- Document {i+1} [{doc.get('source_type', 'unknown')}] ---\n"
-        out += f"Title: {doc.get('title', 'N/A')}\n"
-        out += f"Source: {doc.get('source_url', 'N/A')}\n"
-        out += f"{doc.get('content', '')[:3000]}\n"
-    return out
+def analyze_batch(companies: list[tuple[str, str]], conn=None, use_search: dict[str, bool] | None = None) -> dict[str, dict | None]:
+    # Same result as analyze() per ticker, but COMPLETE runs once for all
+    # prompts (plus once more for any JSON that needs fixing) and every
+    # analysis row lands in one write. Meant for portfolio and nightly runs.
+    use_search = use_search or {}
+    results: dict[str, dict | None] = {}
+    names = dict(companies)
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        built = {}
+        for ticker, company_name in companies:
+            cached = _cached_analysis(cur, ticker)
+            if cached:
+                print(f"  Using cached analysis for {ticker}")
+                results[ticker] = cached
+                continue
+            print(f"\n[{ticker}] Building prompt...")
+            built[ticker] = _build_prompt(conn, ticker, company_name, use_search.get(ticker, True))
+            if not built[ticker]:
+                results[ticker] = None
+                del built[ticker]
+
+        print(f"\nRunning Cortex COMPLETE over {len(built)} prompts in one statement...")
+        raws = _complete_many(conn, {t: b["prompt"] for t, b in built.items()})
+        analyses = {}
+        retry = {}
+        for ticker, b in built.items():
+            raw = raws.get(ticker)
+            analysis = _validate(raw, b["source_types"]) if raw else None
+            if analysis:
+                analyses[ticker] = analysis
+            elif raw:
+                retry[ticker] = _fix_prompt(raw)
+        if retry:
+            print(f"  Fixing invalid JSON for {len(retry)} tickers...")
+            for ticker, raw in _complete_many(conn, retry).items():
+                analysis = _validate(raw, built[ticker]["source_types"])
+                if analysis:
+                    analyses[ticker] = analysis
+
+        for ticker in built:
+            results[ticker] = analyses.get(ticker)
+            if ticker not in analyses:
+                print(f"  Failed to get a valid analysis for {ticker}")
+        if not analyses:
+            return results
+
+        rows = [_analysis_row(t, names[t], a, built[t]["doc_count"]) for t, a in analyses.items()]
+        table = _temp_name("ANALYSIS_ROWS")
+        try:
+            _temp_table(conn, table, [
+                "company_ticker STRING", "company_name STRING", "accountability_score INT", "summary TEXT",
+                "issues TEXT", "response TEXT", "timeline TEXT", "score_breakdown TEXT", "sources TEXT", "document_count INT",
+            ], rows)
+            cur.execute(f"""
+                BEGIN;
+                INSERT INTO company_analyses (company_ticker, company_name, accountability_score, summary, issues, response, timeline, score_breakdown, sources, document_count)
+                SELECT company_ticker, company_name, accountability_score, summary, PARSE_JSON(issues), PARSE_JSON(response),
+                       PARSE_JSON(timeline), PARSE_JSON(score_breakdown), PARSE_JSON(sources), document_count
+                FROM {table};
+                MERGE INTO companies t USING (SELECT DISTINCT company_ticker AS ticker, company_name AS name FROM {table}) s
+                ON t.ticker = s.ticker
+                WHEN NOT MATCHED THEN INSERT (ticker, name) VALUES (s.ticker, s.name);
+                COMMIT;
+            """, num_statements=4)
+        finally:
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+        for ticker, analysis in analyses.items():
+            print(f"  Analysis complete for {ticker}: score={analysis['accountability_score']} quality={analysis.get('data_quality')}")
+        return results
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _relevance(doc: dict, rank: int, total: int) -> float:
+    # Term density in the text plus a nudge for Cortex Search's own ordering
+    text = (doc.get("content") or "").lower()
+    hits = sum(text.count(term) for term in RELEVANCE_TERMS)
+    density = hits / max(len(text) / 1000, 1)
+    return 1 + min(density, 4) / 2 + (1 - rank / total) / 2
+
+
+def _doc_header(i: int, doc: dict) -> str:
+    header = (f"\n--- Document {i} [{doc.get('source_type', 'unknown')}] ---\n"
+              f"Title: {doc.get('title', 'N/A')}\n"
+              f"Source: {doc.get('source_url', 'N/A')}\n")
+    alternates = [a.get("source_url") for a in doc.get("alternate_sources") or [] if a.get("source_url")]
+    if alternates:
+        header += f"Also published at: {', '.join(alternates[:5])}\n"
+    return header
+
+
+def _allocate(needs: list[int], weights: list[float], budget: int) -> list[int]:
+    # Split the budget in proportion to weight; a document that needs less
+    # than its share gets all of it and the rest is split again among the others.
+    alloc = [0] * len(needs)
+    active = [i for i in range(len(needs)) if needs[i] > 0]
+    while active and budget > 0:
+        total = sum(weights[i] for i in active)
+        satisfied = [i for i in active if needs[i] - alloc[i] <= budget * weights[i] / total]
+        if not satisfied:
+            for i in active:
+                alloc[i] += int(budget * weights[i] / total)
+            break
+        for i in satisfied:
+            budget -= needs[i] - alloc[i]
+            alloc[i] = needs[i]
+        active = [i for i in active if i not in satisfied]
+    return alloc
+
+
+def _truncate(text: str, tokens: int) -> str:
+    if len(text) <= tokens * CHARS_PER_TOKEN:
+        return text
+    limit = max(0, tokens * CHARS_PER_TOKEN - len(" [...]"))
+    if not limit:
+        return ""
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit] + " [...]"
+
+
+def _pack_docs(docs: list[dict], budget: int = CONTEXT_TOKEN_BUDGET) -> tuple[str, list[dict]]:
+    # Rank by authority x relevance, admit documents while each can get at
+    # least MIN_DOC_TOKENS of text, then share the remaining budget by rank.
+    total = len(docs)
+    ranked = sorted(
+        ((AUTHORITY_WEIGHT.get(d.get("source_type"), 1.0) * _relevance(d, i, total), i, d) for i, d in enumerate(docs)),
+        key=lambda item: (-item[0], item[1]),
+    )
+
+    chosen, headers, remaining = [], [], budget
+    for priority, _, doc in ranked:
+        if len(chosen) >= CONTEXT_DOCS:
+            break
+        header = _doc_header(len(chosen) + 1, doc)
+        cost = estimate_tokens(header) + MIN_DOC_TOKENS
+        if cost > remaining:
+            continue
+        chosen.append((priority, doc))
+        headers.append(header)
+        # The MIN_DOC_TOKENS admission was checked against is reserved too, so
+        # a low-ranked document can't be left with nothing by the split below
+        remaining -= cost
+
+    contents = [doc.get("content") or "" for _, doc in chosen]
+    needs = [estimate_tokens(c) for c in contents]
+    floors = [min(need, MIN_DOC_TOKENS) for need in needs]
+    # What the floors leave unused goes back into the shared budget
+    remaining += sum(MIN_DOC_TOKENS - floor for floor in floors)
+    extra = _allocate([need - floor for need, floor in zip(needs, floors)], [p for p, _ in chosen], remaining)
+    alloc = [floor + more for floor, more in zip(floors, extra)]
+
+    parts = []
+    used = 0
+    for (priority, doc), header, content, tokens in zip(chosen, headers, contents, alloc):
+        body = _truncate(content, tokens)
+        doc_tokens = estimate_tokens(header) + estimate_tokens(body)
+        used += doc_tokens
+        parts.append(f"{header}{body}\n")
+        print(f"    {doc_tokens:>5} tokens  {doc.get('source_type', 'unknown'):<16} "
+              f"{'truncated' if len(body) < len(content) else 'full':<9} {doc.get('source_url', '')}")
+    print(f"  Packed {len(chosen)}/{len(docs)} documents into ~{used}/{budget} tokens")
+    return "".join(parts), [doc for _, doc in chosen]
 
 
 def _parse_json(raw: str) -> dict | None:
@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+
+INGESTION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points spawned by the backend, with the import budget each must stay
+# under and the heavy packages they must not pull in at startup.
+ENTRY_POINTS = {
+    "run": {"budget_ms": 150, "forbidden": ["edgar", "pandas", "snowflake.connector", "requests", "lxml"]},
+    "resolve": {"budget_ms": 100, "forbidden": ["edgar", "pandas", "snowflake.connector", "requests"]},
+    "pipeline": {"budget_ms": 100, "forbidden": ["edgar", "pandas", "snowflake.connector"]},
+}
+
+
+def measure(module: str) -> tuple[float, dict[str, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=INGESTION_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Lines look like: "import time:       412 |       1503 |   encodings"
+    cumulative = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cum_us, name = [p.strip() for p in line.replace("import time:", "|", 1).split("|")]
+        total_us += int(self_us)
+        cumulative[name] = int(cum_us)
+    return total_us / 1000, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when an ingestion entry point imports too much at startup")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Entry points to check")
+    parser.add_argument("--runs", type=int, default=3, help="Take the best of N runs to smooth out noise")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1.0")),
+                        help="Multiply every budget (for slow CI machines)")
+    parser.add_argument("--top", type=int, default=5, help="Show the N slowest imports per entry point")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        spec = ENTRY_POINTS.get(module, {"budget_ms": 100, "forbidden": []})
+        budget = spec["budget_ms"] * args.scale
+        runs = [measure(module) for _ in range(max(1, args.runs))]
+        total_ms, cumulative = min(runs, key=lambda r: r[0])
+
+        leaked = [name for name in spec["forbidden"] if name in cumulative]
+        over = total_ms > budget
+        status = "FAIL" if over or leaked else "ok"
+        print(f"{module:<10} {total_ms:8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        slowest = sorted(cumulative.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        for name, cum_us in slowest:
+            print(f"    {cum_us / 1000:8.1f} ms  {name}")
+        if leaked:
+            print(f"    imported at startup: {', '.join(leaked)}")
+        failed = failed or over or bool(leaked)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
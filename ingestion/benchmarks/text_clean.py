@@ -0,0 +1,111 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+INGESTION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INGESTION_DIR)
+
+from scrapers.text import clean_wikitext, html_document, first, element_text  # noqa: E402
+
+BODY = "//*[contains(concat(' ', normalize-space(@class), ' '), ' field--name-body ')]"
+
+
+# The cleaners these replaced, kept here as the baseline
+def legacy_clean_wikitext(text: str) -> str:
+    text = re.sub(r'\{\{[^}]*\}\}', '', text)
+    text = re.sub(r'\[\[(?:[^|\]]*\|)?([^\]]*)\]\]', r'\1', text)
+    text = re.sub(r"'{2,}", '', text)
+    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.DOTALL)
+    text = re.sub(r'<ref[^/]*/>', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def legacy_html_text(html: str) -> str:
+    # beautifulsoup4 is no longer a requirement; main() skips this baseline
+    # when it isn't installed
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    body_el = soup.select_one("article") or soup.select_one(".field--name-body") or soup.select_one("main")
+    return body_el.get_text(separator="\n", strip=True) if body_el else ""
+
+
+def html_text(html: str) -> str:
+    return element_text(first(html_document(html), "//article", BODY, "//main"))
+
+
+def wikitext_page(paragraphs: int) -> str:
+    # Shaped like a company article: nested infobox templates, cite refs,
+    # piped links, bold/italics and a heading every few paragraphs.
+    parts = ["{{Infobox company|name=Acme|key_people={{ubl|{{nowrap|Jane Doe}}|John Roe}}|revenue={{increase}} US$1B}}"]
+    for i in range(paragraphs):
+        if i % 5 == 0:
+            parts.append(f"\n== Section {i} ==\n")
+        parts.append(
+            f"'''Acme''' was sued by the [[Federal Trade Commission|FTC]] in {1990 + i % 30} over ''deceptive'' "
+            f"[[advertising]] practices.<ref name=\"r{i}\">{{{{cite news|title=Report {i}|url=https://example.com/{i}}}}}</ref> "
+            f"The case was settled{{{{citation needed|date=May 2020}}}} after review by <small>regulators</small>.<ref name=\"r{i}\"/>\n"
+        )
+    return "".join(parts)
+
+
+def html_page(paragraphs: int) -> str:
+    body = "".join(
+        f"<p>The <a href='/x{i}'>agency</a> announced a <strong>settlement</strong> of ${i},000 "
+        f"with the employer.<br/>Details <em>follow</em>.</p>\n" for i in range(paragraphs)
+    )
+    return (
+        "<html><head><title>Press release</title><script>var x = 1;</script></head><body>"
+        "<nav><ul>" + "".join(f"<li><a href='/n{i}'>Link {i}</a></li>" for i in range(80)) + "</ul></nav>"
+        f"<main><h1>EEOC Settles Case</h1><article><time datetime='2024-03-01'>March 1</time>{body}</article></main>"
+        "</body></html>"
+    )
+
+
+def best_of(fn, arg, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the text cleaners against the ones they replaced")
+    parser.add_argument("--sizes", type=str, default="10,100,1000", help="Comma-separated paragraph counts")
+    parser.add_argument("--runs", type=int, default=5, help="Take the best of N runs to smooth out noise")
+    args = parser.parse_args()
+
+    try:
+        import bs4  # noqa: F401
+        has_bs4 = True
+    except ImportError:
+        has_bs4 = False
+        print("beautifulsoup4 is not installed (pip install beautifulsoup4); the html baseline is skipped\n")
+
+    print(f"{'input':<10} {'paragraphs':>10} {'KB':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}")
+    for paragraphs in (int(s) for s in args.sizes.split(",")):
+        for label, make, legacy, new in (
+            ("wikitext", wikitext_page, legacy_clean_wikitext, clean_wikitext),
+            ("html", html_page, legacy_html_text, html_text),
+        ):
+            page = make(paragraphs)
+            after = best_of(new, page, args.runs)
+            if label == "html" and not has_bs4:
+                print(f"{label:<10} {paragraphs:>10} {len(page) / 1024:>8.1f} {'-':>10} {after:>8.2f} {'-':>8}")
+                continue
+            before = best_of(legacy, page, args.runs)
+            print(f"{label:<10} {paragraphs:>10} {len(page) / 1024:>8.1f} {before:>10.2f} {after:>8.2f} {before / after:>7.1f}x")
+
+    # The old template pattern stops at the first "}", leaving the tail of
+    # nested templates in the text
+    sample = wikitext_page(1)
+    print(f"\nleftover template braces: legacy {legacy_clean_wikitext(sample).count('}}')}, new {clean_wikitext(sample).count('}}')}")
+
+
+if __name__ == "__main__":
+    main()
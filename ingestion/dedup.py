@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+
+# Syndicated stories come back from NewsAPI under several URLs (and sometimes
+# as both a "news" and a "social" hit) with only boilerplate differences. A
+# 64-bit SimHash over word shingles puts such copies within a few bits of each
+# other, while unrelated documents differ in about half of them.
+ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() in ("true", "1", "yes")
+MAX_DISTANCE = int(os.getenv("NEAR_DUP_DISTANCE", "3"))
+# Copies of a story are syndicated within days of each other, so a run only
+# compares against documents stored this recently
+LOOKBACK_DAYS = int(os.getenv("NEAR_DUP_LOOKBACK_DAYS", "90"))
+MAX_FINGERPRINTS = 5000
+BITS = 64
+SHINGLE = 3
+# Below this many words the fingerprint is mostly noise
+MIN_WORDS = 20
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text: str | None) -> int | None:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < MIN_WORDS:
+        return None
+    counts = [0] * BITS
+    for i in range(len(words) - SHINGLE + 1):
+        shingle = " ".join(words[i:i + SHINGLE]).encode()
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+        for bit in range(BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(BITS) if counts[bit] > 0)
+
+
+def to_hex(fp: int | None) -> str | None:
+    return None if fp is None else f"{fp:016x}"
+
+
+def from_hex(value: str | None) -> int | None:
+    try:
+        return int(value, 16) if value else None
+    except ValueError:
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    # Splits each fingerprint into MAX_DISTANCE + 1 bands. Two fingerprints at
+    # most MAX_DISTANCE bits apart must agree exactly on at least one band,
+    # so only documents sharing a band are compared.
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.width = BITS // self.bands
+        self._mask = (1 << self.width) - 1
+        self._buckets: list[dict[int, list]] = [{} for _ in range(self.bands)]
+
+    def _keys(self, fp: int):
+        for band in range(self.bands):
+            yield band, fp >> (band * self.width) & self._mask
+
+    def find(self, fp: int):
+        best = None
+        for band, key in self._keys(fp):
+            for other, value in self._buckets[band].get(key, ()):
+                distance = hamming(fp, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, value)
+        return best[1] if best else None
+
+    def add(self, fp: int, value):
+        for band, key in self._keys(fp):
+            self._buckets[band].setdefault(key, []).append((fp, value))
+
+
+def alternate(doc: dict) -> dict:
+    return {
+        "source_url": doc.get("source_url"),
+        "source_type": doc.get("source_type"),
+        "title": doc.get("title"),
+        "document_date": str(doc["document_date"]) if doc.get("document_date") else None,
+    }
+
+
+def dedupe(docs: list[dict]) -> list[dict]:
+    # Keeps the first copy of each story in the given order and lists the
+    # others under "alternate_sources" on it.
+    if not ENABLED:
+        return docs
+    index = NearDuplicateIndex()
+    kept = []
+    for doc in docs:
+        fp = simhash(doc.get("content"))
+        canonical = index.find(fp) if fp is not None else None
+        if canonical is not None and canonical.get("source_url") != doc.get("source_url"):
+            canonical.setdefault("alternate_sources", []).append(alternate(doc))
+            continue
+        doc = dict(doc)
+        if fp is not None:
+            index.add(fp, doc)
+        kept.append(doc)
+    return kept
@@ -1,11 +1,30 @@
-import snowflake.connector
-import pandas as pd
+import atexit
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
 from dotenv import load_dotenv
+import dedup
+from snowflake_pool import ConnectionPool
 
 load_dotenv()
 
-def get_connection():
+# Source types whose per-document Cortex sentiment feeds the analysis
+SENTIMENT_SOURCES = ("reddit_post",)
+
+DOCUMENT_COLUMNS = ["company_ticker", "company_name", "source_type", "source_url", "document_date", "title", "content"]
+
+def content_hash(content) -> str:
+    # Matches SHA2(content, 256) in Snowflake, which the backfill in
+    # snowflake/03_content_hash.sql uses for rows loaded before this column.
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+def get_connection(keep_alive: bool = False):
+    import snowflake.connector
     return snowflake.connector.connect(
         account=os.getenv("SNOWFLAKE_ACCOUNT"),
         user=os.getenv("SNOWFLAKE_USER"),
@@ -13,47 +32,299 @@ def get_connection():
         database=os.getenv("SNOWFLAKE_DATABASE", "hera_db"),
         schema=os.getenv("SNOWFLAKE_SCHEMA", "public"),
         warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "hera_wh"),
+        client_session_keep_alive=keep_alive,
     )
 
-def load_documents(docs: list[dict]):
-    if not docs:
-        print("  No documents to load")
+# One pool per process: loads, watermark reads and analyses check sessions
+# out of it instead of logging in for every call.
+pool = ConnectionPool(
+    lambda: get_connection(keep_alive=True),
+    max_size=int(os.getenv("SNOWFLAKE_POOL_SIZE", "4")),
+)
+atexit.register(pool.close_all)
+
+@contextmanager
+def connection(conn=None):
+    if conn is not None:
+        yield conn
+        return
+    with pool.connection() as pooled:
+        yield pooled
+
+def get_watermarks(ticker: str, conn=None) -> dict[str, str]:
+    # The watermark for a (ticker, source) is simply the newest document_date
+    # already in raw_documents, so it can never run ahead of what was loaded.
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT source_type, MAX(document_date)
+            FROM raw_documents
+            WHERE company_ticker = %s AND document_date IS NOT NULL
+            GROUP BY source_type
+        """, (ticker,))
+        return {row[0]: str(row[1]) for row in cur.fetchall() if row[1] is not None}
+
+def get_fingerprints(ticker: str, conn=None) -> list[tuple[int, str, str]]:
+    # (simhash, source_url, content_hash) of stored documents, so a story
+    # loaded on an earlier run is recognised when it turns up under a new URL.
+    # Only recent rows are pulled, so the cost doesn't grow with history; rows
+    # loaded before the simhash column existed are skipped.
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT simhash, source_url, content_hash
+            FROM raw_documents
+            WHERE company_ticker = %s AND simhash IS NOT NULL
+              AND ingested_at >= DATEADD('day', -%s, CURRENT_TIMESTAMP())
+            ORDER BY ingested_at DESC
+            LIMIT %s
+        """, (ticker, dedup.LOOKBACK_DAYS, dedup.MAX_FINGERPRINTS))
+        rows = [(dedup.from_hex(row[0]), row[1], row[2]) for row in cur.fetchall()]
+        return [row for row in rows if row[0] is not None]
+
+def add_alternates(updates: list[tuple[str, str, str, list[dict]]], conn=None) -> int:
+    # Appends to metadata:alternate_sources of already-loaded canonical rows,
+    # keyed like the load MERGE by (ticker, url, content hash). Re-scrapes find
+    # the same alternates again, so the array is kept distinct.
+    if not updates:
         return 0
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        cur.executemany("""
+            UPDATE raw_documents
+            SET metadata = OBJECT_INSERT(
+                COALESCE(metadata, OBJECT_CONSTRUCT()), 'alternate_sources',
+                ARRAY_DISTINCT(ARRAY_CAT(COALESCE(metadata:alternate_sources, ARRAY_CONSTRUCT()), PARSE_JSON(%s))), TRUE)
+            WHERE company_ticker = %s AND source_url = %s AND content_hash = %s
+        """, [(json.dumps(alts), ticker, url, chash) for ticker, url, chash, alts in updates])
+        conn.commit()
+    return len(updates)
 
-    conn = get_connection()
-    try:
-        existing = set()
+def score_sentiment(tickers: list[str] | None = None, conn=None) -> int:
+    # Scores rows that have no sentiment yet, so each document goes through
+    # Cortex SENTIMENT once. With no tickers this is the backfill over the
+    # whole table.
+    sources = ", ".join(f"'{s}'" for s in SENTIMENT_SOURCES)
+    sql = f"""
+        UPDATE raw_documents
+        SET sentiment = SNOWFLAKE.CORTEX.SENTIMENT(content)
+        WHERE sentiment IS NULL AND source_type IN ({sources})
+          AND content IS NOT NULL AND LENGTH(content) > 50
+    """
+    params = None
+    if tickers:
+        sql += f" AND company_ticker IN ({', '.join(['%s'] * len(tickers))})"
+        params = tuple(tickers)
+    with connection(conn) as conn:
         cur = conn.cursor()
-        tickers = list({d["company_ticker"] for d in docs})
-        placeholders = ",".join(["%s"] * len(tickers))
-        cur.execute(f"SELECT source_url FROM raw_documents WHERE company_ticker IN ({placeholders})", tickers)
-        existing = {row[0] for row in cur.fetchall()}
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+def load_documents(docs: list[dict], conn=None):
+    if not docs:
+        print("  No documents to load")
+        return 0
 
-        new_docs = [d for d in docs if d.get("source_url") and d["source_url"] not in existing]
+    with connection(conn) as conn:
+        # Dedup happens server-side: rows go to a session-scoped stage table
+        # and a single MERGE inserts the (ticker, url, content hash) versions
+        # raw_documents doesn't have yet. Nothing is pulled back to Python,
+        # and concurrent loads of the same ticker can't double-insert.
+        new_docs = [d for d in docs if d.get("source_url")]
         if not new_docs:
-            print("  All documents already loaded")
+            print("  No documents with a source URL to load")
             return 0
 
+        import pandas as pd
         df = pd.DataFrame(new_docs)
-        for col in ["company_ticker", "company_name", "source_type", "source_url", "document_date", "title", "content"]:
+        for col in DOCUMENT_COLUMNS:
             if col not in df.columns:
                 df[col] = None
 
         # Ensure document_date column can hold None values (use object dtype to avoid NaT issues)
         df["document_date"] = df["document_date"].astype(object).where(df["document_date"].notna(), None)
+        df["content_hash"] = df["content"].map(content_hash)
+        if "simhash" not in df.columns:
+            df["simhash"] = None
+        df["simhash"] = [h or dedup.to_hex(dedup.simhash(c)) for h, c in zip(df["simhash"], df["content"])]
+        if "metadata" not in df.columns:
+            df["metadata"] = None
+        df["metadata"] = [json.dumps(m) if isinstance(m, dict) else None for m in df["metadata"]]
 
         # Snowflake expects uppercase unquoted identifiers
-        df = df[["company_ticker", "company_name", "source_type", "source_url", "document_date", "title", "content"]]
+        df = df[DOCUMENT_COLUMNS + ["content_hash", "simhash", "metadata"]]
         df.columns = [c.upper() for c in df.columns]
 
-        from snowflake.connector.pandas_tools import write_pandas
-        success, nchunks, nrows, _ = write_pandas(
-            conn, df,
-            "RAW_DOCUMENTS",
-            auto_create_table=False,
-            quote_identifiers=False
-        )
-        print(f"  Loaded {nrows} new documents into Snowflake")
+        stage = f"RAW_DOCUMENTS_STAGE_{uuid.uuid4().hex[:12].upper()}"
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE TEMPORARY TABLE {stage} (
+                company_ticker STRING, company_name STRING, source_type STRING, source_url STRING,
+                document_date DATE, title STRING, content TEXT, content_hash STRING,
+                simhash STRING, metadata STRING
+            )
+        """)
+        try:
+            from snowflake.connector.pandas_tools import write_pandas
+            write_pandas(conn, df, stage, auto_create_table=False, quote_identifiers=False)
+            cur.execute(f"""
+                MERGE INTO raw_documents t
+                USING (
+                    SELECT company_ticker, company_name, source_type, source_url, document_date, title, content,
+                           content_hash, simhash, PARSE_JSON(metadata) AS metadata
+                    FROM {stage}
+                    QUALIFY ROW_NUMBER() OVER (PARTITION BY company_ticker, source_url, content_hash ORDER BY title) = 1
+                ) s
+                ON t.company_ticker = s.company_ticker
+                   AND t.source_url = s.source_url
+                   AND t.content_hash = s.content_hash
+                WHEN NOT MATCHED THEN INSERT
+                    (company_ticker, company_name, source_type, source_url, document_date, title, content, content_hash, simhash, metadata)
+                VALUES
+                    (s.company_ticker, s.company_name, s.source_type, s.source_url, s.document_date, s.title, s.content, s.content_hash,
+                     s.simhash, s.metadata)
+            """)
+            row = cur.fetchone()
+            nrows = int(row[0]) if row else 0
+            if nrows and any(d.get("source_type") in SENTIMENT_SOURCES for d in new_docs):
+                # The rows are loaded either way; --backfill-sentiment scores
+                # whatever this misses
+                try:
+                    score_sentiment(sorted({d["company_ticker"] for d in new_docs}), conn)
+                except Exception as e:
+                    print(f"  Sentiment scoring failed, leaving it for --backfill-sentiment: {e}")
+        finally:
+            # Temp tables live as long as the session, and pooled sessions live long
+            cur.execute(f"DROP TABLE IF EXISTS {stage}")
+
+        if not nrows:
+            print("  All documents already loaded")
+            return 0
+        print(f"  Loaded {nrows} new documents into Snowflake ({len(new_docs) - nrows} unchanged)")
         return nrows
-    finally:
-        conn.close()
+
+_CLOSE = object()
+
+class BatchWriter:
+    # Scrapers push documents as they produce them; a background thread
+    # flushes micro-batches to Snowflake once LOAD_BATCH_SIZE documents are
+    # waiting or the oldest has waited LOAD_BATCH_SECONDS. Loading overlaps
+    # scraping, and the bounded queue caps how much sits in memory.
+    # Near-duplicates of a document already seen for the ticker (this run or
+    # a stored one) are dropped here and recorded as alternate sources of the
+    # canonical copy instead.
+    def __init__(self, batch_size: int | None = None, max_delay: float | None = None, gate=None):
+        self.batch_size = batch_size or int(os.getenv("LOAD_BATCH_SIZE", "25"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("LOAD_BATCH_SECONDS", "5"))
+        self.gate = gate or nullcontext
+        self.received = 0
+        self.loaded = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.urls: list[str] = []
+        self._indexes: dict[str, dedup.NearDuplicateIndex] = {}
+        self._unflushed: dict[int, dict] = {}
+        self._alternates: dict[tuple[str, str, str], list[dict]] = {}
+        self._queue = queue.Queue(maxsize=self.batch_size * 4)
+        self._thread = threading.Thread(target=self._run, name="batch-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, doc: dict, timeout: float | None = None) -> bool:
+        # False if the queue stayed full for timeout seconds
+        try:
+            self._queue.put(doc, timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self) -> int:
+        # A failed batch is logged and counted in failed; the rest still count
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        return self.loaded
+
+    def _run(self):
+        batch = []
+        oldest = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, oldest + self.max_delay - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                self._flush(batch)
+                self._record_alternates()
+                return
+            if item is not None and self._admit(item):
+                if not batch:
+                    oldest = time.monotonic()
+                batch.append(item)
+                self.received += 1
+            if len(batch) >= self.batch_size or (batch and time.monotonic() - oldest >= self.max_delay):
+                self._flush(batch)
+                batch = []
+
+    def _index(self, ticker: str) -> dedup.NearDuplicateIndex:
+        if ticker not in self._indexes:
+            index = self._indexes[ticker] = dedup.NearDuplicateIndex()
+            try:
+                for fp, url, chash in get_fingerprints(ticker):
+                    index.add(fp, {"ticker": ticker, "source_url": url, "content_hash": chash, "doc": None})
+            except Exception as e:
+                print(f"  Near-duplicate check limited to this run for {ticker}: {e}")
+        return self._indexes[ticker]
+
+    def _admit(self, doc: dict) -> bool:
+        fp = dedup.simhash(doc.get("content")) if dedup.ENABLED else None
+        if fp is None:
+            return True
+        index = self._index(doc.get("company_ticker"))
+        canonical = index.find(fp)
+        # A changed page under the same URL is a new version, not a duplicate
+        if canonical is None or canonical["source_url"] == doc.get("source_url"):
+            doc["simhash"] = dedup.to_hex(fp)
+            entry = {"ticker": doc.get("company_ticker"), "source_url": doc.get("source_url"),
+                     "content_hash": content_hash(doc.get("content")), "doc": doc}
+            index.add(fp, entry)
+            self._unflushed[id(doc)] = entry
+            return True
+
+        self.duplicates += 1
+        alternate = dedup.alternate(doc)
+        if canonical["doc"] is not None:
+            # Canonical is still waiting in the current batch
+            canonical["doc"].setdefault("metadata", {}).setdefault("alternate_sources", []).append(alternate)
+        else:
+            key = (canonical["ticker"], canonical["source_url"], canonical["content_hash"])
+            self._alternates.setdefault(key, []).append(alternate)
+        return False
+
+    def _record_alternates(self):
+        if not self._alternates:
+            return
+        updates = [(*key, alts) for key, alts in self._alternates.items()]
+        try:
+            with self.gate():
+                add_alternates(updates)
+        except Exception as e:
+            print(f"  Failed to record alternate sources for {len(updates)} documents: {e}")
+
+    def _flush(self, batch: list[dict]):
+        for d in batch:
+            entry = self._unflushed.pop(id(d), None)
+            if entry:
+                entry["doc"] = None
+        if not batch:
+            return
+        try:
+            with self.gate():
+                self.loaded += load_documents(batch)
+            self.batches += 1
+            # Cortex Search only indexes documents with more than 50 characters
+            self.urls.extend(d["source_url"] for d in batch if d.get("source_url") and len(d.get("content") or "") > 50)
+        except Exception as e:
+            print(f"  Failed to load a batch of {len(batch)} documents: {e}")
+            self.failed += len(batch)
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class Stage:
+    def __init__(self, name: str, limit: int, unit: str = "tickers"):
+        self.name = name
+        self.unit = unit
+        self.limit = max(1, limit)
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.items = 0
+        self.busy = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    @contextmanager
+    def slot(self):
+        with self._slots:
+            start = time.monotonic()
+            ok = False
+            try:
+                yield self
+                ok = True
+            finally:
+                end = time.monotonic()
+                with self._lock:
+                    self.busy += end - start
+                    self.first_start = start if self.first_start is None else min(self.first_start, start)
+                    self.last_end = end if self.last_end is None else max(self.last_end, end)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+    def add_items(self, n: int):
+        with self._lock:
+            self.items += n
+
+    def summary(self) -> str:
+        span = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        per_min = self.completed / span * 60 if span > 0 else 0.0
+        avg = self.busy / (self.completed + self.failed) if (self.completed + self.failed) else 0.0
+        util = self.busy / (span * self.limit) * 100 if span > 0 else 0.0
+        return (f"  {self.name:<8} limit={self.limit:<3} done={self.completed:<4} failed={self.failed:<3} "
+                f"items={self.items:<6} avg={avg:6.1f}s  {per_min:6.1f} {self.unit}/min  util={util:3.0f}%")
+
+
+def run_pipeline(tickers: list[str], job, scrape_workers: int = 4, load_workers: int = 2, analyze_workers: int = 2,
+                 outcome: str = "analyzed") -> int:
+    # outcome names what a successful job has done, e.g. "loaded, analysis
+    # deferred" when the analysis runs as a separate batch step afterwards
+    stages = {
+        "scrape": Stage("scrape", scrape_workers),
+        "load": Stage("load", load_workers, unit="batches"),
+        "analyze": Stage("analyze", analyze_workers),
+    }
+    # Every in-flight ticker holds a thread; bounding the pool to the sum of the
+    # stage limits keeps each stage busy without queueing hundreds of threads.
+    max_in_flight = sum(s.limit for s in stages.values())
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="pipeline") as pool:
+        outcomes = list(pool.map(lambda t: job(t, stages), tickers))
+    elapsed = time.monotonic() - start
+
+    succeeded = sum(1 for ok in outcomes if ok)
+    print(f"\n{'='*50}")
+    print(f"Pipeline summary: {succeeded}/{len(tickers)} tickers {outcome} in {elapsed:.1f}s "
+          f"({len(tickers) / elapsed * 60 if elapsed else 0:.1f} tickers/min)")
+    for stage in stages.values():
+        print(stage.summary())
+    print(f"{'='*50}")
+    return succeeded
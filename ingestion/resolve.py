@@ -1,13 +1,36 @@
 import sys
 import json
-import edgar
-edgar.set_identity("Hera Research hera@example.com")
+import os
+
+from ticker_index import get_index
+
+# Inputs the local index can't place fall back to edgar's network search; cap
+# how many one request may send so a long junk paste can't take minutes.
+NETWORK_FALLBACK_LIMIT = int(os.getenv("RESOLVE_NETWORK_FALLBACK_LIMIT", "10"))
 
 def looks_like_ticker(s: str) -> bool:
     return bool(s) and len(s) <= 5 and s.isalpha() and s == s.upper()
 
+def resolve_local(index, input_str: str) -> dict | None:
+    clean = input_str.strip()
+    if not clean:
+        return None
+    # Share classes come as "BRK.B"; the index stores them as "BRK-B"
+    symbol = clean.upper().replace(".", "-")
+    # Typed in lowercase, an alias wins over a ticker: "coke" means KO, not COKE
+    found = index.by_alias(clean) if clean != clean.upper() else None
+    if not found and looks_like_ticker(symbol.replace("-", "")):
+        found = index.by_ticker(symbol)
+    found = found or index.by_name(clean)
+    if found:
+        return {"input": input_str, "ticker": found["ticker"], "company_name": found["company_name"]}
+    return None
+
 def resolve(input_str: str) -> dict:
+    # edgar is only needed once there is something to look up
+    import edgar
     from edgar import Company, find
+    edgar.set_identity("Hera Research hera@example.com")
     clean = input_str.strip()
 
     # If it looks like a ticker (e.g. MSFT, AAPL), try Company() directly
@@ -34,7 +57,18 @@ def resolve(input_str: str) -> dict:
 
     return {"input": input_str, "ticker": None, "company_name": None}
 
+def resolve_many(inputs: list[str]) -> list[dict]:
+    index = get_index()
+    results = []
+    fallbacks = 0
+    for input_str in inputs:
+        result = resolve_local(index, input_str) if index else None
+        if result is None and fallbacks < NETWORK_FALLBACK_LIMIT and input_str.strip():
+            fallbacks += 1
+            result = resolve(input_str)
+        results.append(result or {"input": input_str, "ticker": None, "company_name": None})
+    return results
+
 if __name__ == "__main__":
     inputs = json.loads(sys.argv[1])
-    results = [resolve(i) for i in inputs]
-    print(json.dumps(results))
+    print(json.dumps(resolve_many(inputs)))
@@ -1,37 +1,185 @@
 import argparse
+import importlib
+import json
+import os
+import sys
+import threading
 import time
-import edgar
-edgar.set_identity("Hera Research hera@example.com")
-
-from scrapers import sec_edgar, courtlistener, news, eeoc, reddit, wikipedia, glassdoor_proxy, twitter
-from loader import load_documents
-from analyzer import analyze
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from loader import BatchWriter, get_watermarks, score_sentiment
+from analyzer import analyze, analyze_batch, search_index_ready
 from dotenv import load_dotenv
-from edgar import Company
 
 load_dotenv()
 
+# Scraper modules (and edgar, requests, lxml behind them) are imported on
+# first use so that paths which never scrape don't pay for them.
+def _scraper(module: str):
+    return importlib.import_module(f"scrapers.{module}")
+
+# Each scraper gets (ticker, company name, watermarks). Watermarks map
+# source_type -> latest document_date already in raw_documents; scrapers that
+# can filter by date upstream only ask for newer items.
 SCRAPERS = [
-    ("SEC EDGAR", lambda t, n: sec_edgar.scrape(t)),
-    ("CourtListener", lambda t, n: courtlistener.scrape(t, n)),
-    ("NewsAPI", lambda t, n: news.scrape(t, n)),
-    ("EEOC", lambda t, n: eeoc.scrape(t, n)),
-    ("Reddit", lambda t, n: reddit.scrape(t, n)),
-    ("Wikipedia", lambda t, n: wikipedia.scrape(t, n)),
-    ("Glassdoor Proxy", lambda t, n: glassdoor_proxy.scrape(t, n)),
-    ("Social News", lambda t, n: twitter.scrape(t, n)),
+    ("SEC EDGAR", lambda t, n, w: _scraper("sec_edgar").scrape(t, watermarks=w)),
+    ("CourtListener", lambda t, n, w: _scraper("courtlistener").scrape(t, n, watermarks=w)),
+    ("NewsAPI", lambda t, n, w: _scraper("news").scrape(t, n, watermarks=w)),
+    ("EEOC", lambda t, n, w: _scraper("eeoc").scrape(t, n)),
+    ("Reddit", lambda t, n, w: _scraper("reddit").scrape(t, n)),
+    ("Wikipedia", lambda t, n, w: _scraper("wikipedia").scrape(t, n)),
+    ("Glassdoor Proxy", lambda t, n, w: _scraper("glassdoor_proxy").scrape(t, n, watermarks=w)),
+    ("Social News", lambda t, n, w: _scraper("twitter").scrape(t, n, watermarks=w)),
 ]
 
+SCRAPER_MODULES = ["sec_edgar", "courtlistener", "news", "eeoc", "reddit", "wikipedia", "glassdoor_proxy", "twitter"]
+
+SCRAPE_PARALLEL = os.getenv("SCRAPE_PARALLEL", "true").lower() in ("true", "1", "yes")
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "60"))
+TICKER_DEADLINE = float(os.getenv("TICKER_DEADLINE", "120"))
+# How often a scraper blocked on a full load queue checks whether it was abandoned
+SINK_RETRY = 0.5
+INCREMENTAL_SCRAPE = os.getenv("INCREMENTAL_SCRAPE", "true").lower() in ("true", "1", "yes")
+
+def warm_imports():
+    # Long-lived processes (worker.py) pay the heavy imports once up front
+    # instead of on their first job.
+    for module in SCRAPER_MODULES:
+        _scraper(module)
+    import pandas
+    import snowflake.connector
+    from snowflake.connector.pandas_tools import write_pandas
+
 def get_company_name(ticker: str) -> str:
     try:
-        c = Company(ticker)
+        c = _scraper("sec_edgar").company(ticker)
         if c.name and "Entity" not in c.name:
             return c.name
     except Exception:
         pass
     return ticker
 
-def process_ticker(ticker: str):
+def prefetch_wikipedia(tickers: list[str]):
+    # Portfolio runs: pull every company's Wikipedia page in multi-title
+    # queries up front rather than one request per ticker mid-pipeline.
+    if os.getenv("WIKIPEDIA_ENABLED", "true").lower() not in ("true", "1", "yes"):
+        return
+    try:
+        from ticker_index import get_index
+        index = get_index()
+        found = [index.by_ticker(t) for t in tickers] if index else []
+        names = [f["company_name"] for f in found if f]
+        if names:
+            _scraper("wikipedia").prefetch(names)
+    except Exception as e:
+        print(f"  [Wikipedia] Prefetch failed: {e}")
+
+def load_watermarks(ticker: str, full: bool = False) -> dict:
+    if full or not INCREMENTAL_SCRAPE:
+        return {}
+    try:
+        watermarks = get_watermarks(ticker)
+    except Exception as e:
+        print(f"  Could not read watermarks, doing a full scrape: {e}")
+        return {}
+    if watermarks:
+        print("  Incremental scrape since: " + ", ".join(f"{k}={v}" for k, v in sorted(watermarks.items())))
+    return watermarks
+
+def _scrape_sequential(ticker: str, name: str, watermarks: dict, sink) -> int:
+    count = 0
+    for label, scraper_fn in SCRAPERS:
+        try:
+            for doc in scraper_fn(ticker, name, watermarks):
+                sink(doc)
+                count += 1
+        except Exception as e:
+            print(f"  [{label}] Failed: {e}")
+    return count
+
+def scrape_sources(ticker: str, name: str, watermarks: dict | None, sink) -> int:
+    # Scrapers may return a list or yield documents one at a time; either way
+    # each document is handed to sink as soon as it exists, so loading can
+    # start before the slowest source finishes. Returns the number streamed.
+    watermarks = watermarks or {}
+    if not SCRAPE_PARALLEL:
+        return _scrape_sequential(ticker, name, watermarks, sink)
+
+    # Scrapers are almost entirely network-bound, so fan them out on threads.
+    # A scraper that overruns SCRAPER_TIMEOUT (or the whole ticker running past
+    # TICKER_DEADLINE) is abandoned; whatever it already streamed is kept.
+    started = {}
+    abandoned = set()
+    lock = threading.Lock()
+    count = 0
+
+    def run_one(label, scraper_fn):
+        nonlocal count
+        started[label] = time.monotonic()
+        for doc in scraper_fn(ticker, name, watermarks):
+            # The sink blocks while the writer waits for a load slot, so it is
+            # called outside the lock and retried until it takes the document
+            # or the scraper is abandoned
+            while True:
+                with lock:
+                    if label in abandoned:
+                        return
+                if sink(doc, timeout=SINK_RETRY):
+                    break
+            with lock:
+                count += 1
+
+    def abandon(labels):
+        with lock:
+            abandoned.update(labels)
+
+    pool = ThreadPoolExecutor(max_workers=len(SCRAPERS), thread_name_prefix=f"scrape-{ticker}")
+    futures = {pool.submit(run_one, label, fn): label for label, fn in SCRAPERS}
+    pending = set(futures)
+    deadline = time.monotonic() + TICKER_DEADLINE
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                for f in pending:
+                    print(f"  [{futures[f]}] Abandoned: ticker deadline of {TICKER_DEADLINE:.0f}s reached")
+                break
+
+            next_check = deadline
+            for f in list(pending):
+                start = started.get(futures[f])
+                if start is None:
+                    continue
+                if now - start >= SCRAPER_TIMEOUT:
+                    print(f"  [{futures[f]}] Timed out after {SCRAPER_TIMEOUT:.0f}s")
+                    abandon([futures[f]])
+                    pending.discard(f)
+                else:
+                    next_check = min(next_check, start + SCRAPER_TIMEOUT)
+
+            done, pending = wait(pending, timeout=max(next_check - now, 0.05), return_when=FIRST_COMPLETED)
+            for f in done:
+                try:
+                    f.result()
+                except Exception as e:
+                    print(f"  [{futures[f]}] Failed: {e}")
+    finally:
+        # Threads cannot be killed; abandoned scrapers finish in the background
+        # and anything they produce from here on is dropped.
+        abandon(futures.values())
+        pool.shutdown(wait=False, cancel_futures=True)
+    return count
+
+def index_ready(ticker: str, writer: BatchWriter) -> bool:
+    if not writer.loaded:
+        # Nothing new went in, so the index is as fresh as it is going to get
+        return True
+    ready = search_index_ready(ticker, writer.urls)
+    if not ready:
+        print(f"  Cortex Search not caught up for {ticker}; analyzing from raw_documents")
+    return ready
+
+def process_ticker(ticker: str, on_stage=None, full: bool = False) -> dict | None:
+    stage = on_stage or (lambda name: None)
     ticker = ticker.strip().upper()
     print(f"\n{'='*50}")
     print(f"Processing {ticker}")
@@ -40,24 +188,72 @@ def process_ticker(ticker: str):
     name = get_company_name(ticker)
     print(f"Company: {name}")
 
-    print(f"\n[1/4] Scraping {len(SCRAPERS)} sources...")
-    all_docs = []
-    for label, scraper_fn in SCRAPERS:
+    stage("scrape")
+    print(f"\n[1/4] Scraping {len(SCRAPERS)} sources (loading into Snowflake as documents arrive)...")
+    watermarks = load_watermarks(ticker, full)
+    writer = BatchWriter()
+    try:
+        scraped = scrape_sources(ticker, name, watermarks, writer.add)
+    finally:
+        stage("load")
+        print("\n[2/4] Flushing remaining documents into Snowflake...")
+        writer.close()
+    print(f"  Scraped {scraped} documents ({writer.duplicates} near-duplicates), loaded {writer.loaded} new in {writer.batches} batch(es)")
+    if writer.failed:
+        print(f"  {writer.failed} documents failed to load; analyzing what is in Snowflake")
+
+    stage("index")
+    print("\n[3/4] Checking Cortex Search freshness...")
+    fresh = index_ready(ticker, writer)
+
+    stage("analyze")
+    print("\n[4/4] Running AI analysis...")
+    result = analyze(ticker, name, use_search=fresh)
+    report_result(ticker, result)
+    return result
+
+def pipeline_job(ticker: str, stages, full: bool = False, deferred: dict | None = None) -> bool:
+    # With deferred given, the ticker stops after load and is recorded there
+    # for analyze_batch instead of going through the analyze stage.
+    ticker = ticker.strip().upper()
+    try:
+        # Batches flush while scraping continues; each flush takes a load slot
+        writer = BatchWriter(gate=stages["load"].slot)
         try:
-            docs = scraper_fn(ticker, name)
-            all_docs.extend(docs)
-        except Exception as e:
-            print(f"  [{label}] Failed: {e}")
+            with stages["scrape"].slot():
+                name = get_company_name(ticker)
+                print(f"\n[{ticker}] Scraping {len(SCRAPERS)} sources for {name}...")
+                scraped = scrape_sources(ticker, name, load_watermarks(ticker, full), writer.add)
+            stages["scrape"].add_items(scraped)
+        finally:
+            writer.close()
+        stages["load"].add_items(writer.loaded)
 
-    print(f"\n[2/4] Loading {len(all_docs)} documents into Snowflake...")
-    load_documents(all_docs)
+        # Readiness polling happens outside any stage slot
+        fresh = index_ready(ticker, writer)
+        if deferred is not None:
+            deferred[ticker] = (name, fresh)
+            return True
 
-    print("\n[3/4] Waiting 10s for Cortex Search indexing...")
-    time.sleep(10)
+        with stages["analyze"].slot():
+            print(f"\n[{ticker}] Running AI analysis...")
+            result = analyze(ticker, name, use_search=fresh)
+        stages["analyze"].add_items(1 if result else 0)
+        report_result(ticker, result)
+        return result is not None
+    except Exception as e:
+        print(f"\n[{ticker}] Pipeline failed: {e}")
+        return False
 
-    print("\n[4/4] Running AI analysis...")
-    result = analyze(ticker, name)
+def emit_result(ticker: str, ok: bool, score=None):
+    # One JSON line per ticker in the same shape as worker.py's "done", for
+    # callers that need more than the exit code. A single write keeps it on
+    # its own line among the pipeline's prints.
+    line = json.dumps({"event": "done", "ticker": ticker.strip().upper(), "ok": ok, "score": score})
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
 
+def report_result(ticker: str, result: dict | None):
     if result:
         score = result.get("accountability_score", "?")
         summary = result.get("summary", "No summary")
@@ -71,19 +267,80 @@ def main():
     parser = argparse.ArgumentParser(description="Hera Ingestion Pipeline")
     parser.add_argument("--ticker", type=str, help="Single ticker to process")
     parser.add_argument("--tickers", type=str, help="Comma-separated tickers")
+    parser.add_argument("--scrape-workers", type=int, default=int(os.getenv("PIPELINE_SCRAPE_WORKERS", "4")),
+                        help="Tickers scraped concurrently in multi-ticker runs")
+    parser.add_argument("--load-workers", type=int, default=int(os.getenv("PIPELINE_LOAD_WORKERS", "2")),
+                        help="Concurrent Snowflake loads in multi-ticker runs")
+    parser.add_argument("--analyze-workers", type=int, default=int(os.getenv("PIPELINE_ANALYZE_WORKERS", "2")),
+                        help="Concurrent Cortex COMPLETE calls in multi-ticker runs")
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and re-scrape every source from scratch")
+    parser.add_argument("--batch-analyze", action="store_true",
+                        help="In multi-ticker runs, analyze every ticker with one set-based Cortex COMPLETE after loading")
+    parser.add_argument("--json-results", action="store_true",
+                        help="Print a JSON line with each ticker's outcome for the backend")
+    parser.add_argument("--backfill-sentiment", action="store_true",
+                        help="Score stored documents that have no sentiment yet (all tickers unless --ticker/--tickers) and exit")
     args = parser.parse_args()
 
     tickers = []
     if args.ticker:
         tickers = [args.ticker]
     elif args.tickers:
-        tickers = [t.strip() for t in args.tickers.split(",")]
-    else:
+        tickers = [t.strip() for t in args.tickers.split(",") if t.strip()]
+
+    if args.backfill_sentiment:
+        scored = score_sentiment([t.upper() for t in tickers] or None)
+        print(f"Scored sentiment for {scored} document(s)")
+        return
+    if not tickers:
         parser.print_help()
         return
 
-    for t in tickers:
-        process_ticker(t)
+    if len(tickers) == 1:
+        try:
+            result = process_ticker(tickers[0], full=args.full)
+        except Exception:
+            if args.json_results:
+                emit_result(tickers[0], False)
+            raise
+        if args.json_results:
+            emit_result(tickers[0], result is not None, result.get("accountability_score") if result else None)
+    else:
+        from pipeline import run_pipeline
+        threading.Thread(target=prefetch_wikipedia, args=(tickers,), daemon=True).start()
+        deferred = {} if args.batch_analyze else None
+
+        def job(ticker, stages):
+            ok = pipeline_job(ticker, stages, full=args.full, deferred=deferred)
+            # Deferred tickers are reported once the batch analysis is done
+            if args.json_results and (not ok or deferred is None):
+                emit_result(ticker, ok)
+            return ok
+
+        outcome = "loaded, analysis deferred" if args.batch_analyze else "analyzed"
+        run_pipeline(tickers, job, args.scrape_workers, args.load_workers, args.analyze_workers, outcome=outcome)
+        if deferred:
+            try:
+                results = analyze_batch(
+                    [(t, name) for t, (name, _) in deferred.items()],
+                    use_search={t: fresh for t, (_, fresh) in deferred.items()},
+                )
+            except Exception as e:
+                print(f"\nBatch analysis failed: {e}")
+                results = {}
+            results = {t: results.get(t) for t in deferred}
+            for ticker, result in results.items():
+                report_result(ticker, result)
+                if args.json_results:
+                    emit_result(ticker, result is not None, result.get("accountability_score") if result else None)
+            analyzed = sum(1 for result in results.values() if result)
+            print(f"\nBatch analysis: {analyzed}/{len(deferred)} tickers analyzed")
+
+    cache = _scraper("http_cache").stats()
+    if cache:
+        print(f"\nHTTP cache: {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['revalidated']} revalidated, {cache['evictions']} evicted, "
+              f"{cache['bytes'] / 1024 / 1024:.1f} MB on disk")
 
     print(f"\nAll done! Processed {len(tickers)} ticker(s).")
 
@@ -1,32 +1,117 @@
 import os
-import requests
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from scrapers import http_cache, http_client
+from scrapers.filing_store import FilingStore
+from scrapers.sec_sections import keyword_windows
+from scrapers.text import html_document, element_text
 
 API_BASE = "https://www.courtlistener.com/api/rest/v4"
+# Search result pages followed at most (cursor pagination, 20 results a page)
+MAX_PAGES = int(os.getenv("COURTLISTENER_PAGES", "3"))
+FETCH_WORKERS = int(os.getenv("COURTLISTENER_FETCH_WORKERS", "3"))
+STORE_ENABLED = os.getenv("COURTLISTENER_STORE_ENABLED", "true").lower() in ("true", "1", "yes")
+# Opinion fields holding the text, best first
+TEXT_FIELDS = ["plain_text", "html_with_citations", "html", "html_lawbox", "html_columbia", "xml_harvard"]
+KEYWORDS = ["harass", "discriminat", "retaliat", "title vii", "hostile work"]
+HEAD_CHARS = 2000
+MAX_CHARS = 8000
 
-def scrape(ticker: str, company_name: str) -> list[dict]:
+_store = FilingStore(os.path.join(http_cache.CACHE_DIR, "court_opinions.sqlite")) if STORE_ENABLED else None
+
+
+def _search(query_params: dict, headers: dict, limit: int) -> list[dict]:
+    results = []
+    url, params = f"{API_BASE}/search/", query_params
+    for _ in range(max(1, MAX_PAGES)):
+        resp = http_client.get(url, params=params, headers=headers, timeout=30)
+        if resp.status_code == 429:
+            print("  [CourtListener] Rate limited on search, keeping what was found")
+            break
+        resp.raise_for_status()
+        data = resp.json()
+        results.extend(data.get("results", []))
+        # The next page's URL carries the cursor and the original query
+        url, params = data.get("next"), None
+        if len(results) >= limit or not url:
+            break
+    return results[:limit]
+
+
+def _opinion_id(result: dict) -> str | None:
+    # v4 nests the cluster's opinions; older result shapes are the opinion itself
+    opinions = result.get("opinions") or []
+    opinion_id = opinions[0].get("id") if opinions else result.get("id")
+    return str(opinion_id) if opinion_id is not None else None
+
+
+def _opinion_text(opinion: dict) -> str:
+    for field in TEXT_FIELDS:
+        value = opinion.get(field) or ""
+        if not value.strip():
+            continue
+        return value.strip() if field == "plain_text" else element_text(html_document(value))
+    return ""
+
+
+def _fetch_opinion(opinion_id: str, headers: dict) -> str:
+    # A filed opinion never changes: read the stored copy, and only spend
+    # rate-limit budget on opinions not seen before
+    if _store:
+        try:
+            text = _store.get(opinion_id)
+            if text is not None:
+                return text
+        except sqlite3.Error as e:
+            print(f"  [CourtListener] Opinion store lookup failed: {e}")
+    try:
+        resp = http_client.get(f"{API_BASE}/opinions/{opinion_id}/", headers=headers, timeout=30, cache_ttl=0)
+        if resp.status_code != 200:
+            return ""
+        text = _opinion_text(resp.json())
+    except Exception as e:
+        print(f"  [CourtListener] Failed to fetch opinion {opinion_id}: {e}")
+        return ""
+    if text and _store:
+        try:
+            _store.put(opinion_id, "opinion", text)
+        except sqlite3.Error as e:
+            print(f"  [CourtListener] Opinion store write failed: {e}")
+    return text
+
+
+def _excerpt(text: str) -> str:
+    # The caption and opening, then the passages about the claims we score
+    if len(text) <= MAX_CHARS:
+        return text
+    windows = keyword_windows(text[HEAD_CHARS:], KEYWORDS, 500, 1500, MAX_CHARS - HEAD_CHARS)
+    return "\n\n[...]\n\n".join([text[:HEAD_CHARS], *windows]) if windows else text[:MAX_CHARS]
+
+
+def scrape(ticker: str, company_name: str, watermarks: dict | None = None) -> list[dict]:
     token = os.getenv("COURTLISTENER_API_TOKEN", "")
     if not token:
         print("  [CourtListener] No API token, skipping")
         return []
 
     limit = int(os.getenv("COURTLISTENER_LIMIT", "5"))
+    headers = {"Authorization": f"Token {token}"}
     docs = []
     query = f'"{company_name}" (harassment OR discrimination OR retaliation OR "Title VII")'
+    params = {"q": query, "type": "o"}
+    since = (watermarks or {}).get("court_opinion")
+    if since:
+        params["filed_after"] = since
     try:
-        resp = requests.get(
-            f"{API_BASE}/search/",
-            params={"q": query, "type": "o"},
-            headers={"Authorization": f"Token {token}"},
-            timeout=30
-        )
-        if resp.status_code == 429:
-            print("  [CourtListener] Rate limited, skipping")
-            return []
-        resp.raise_for_status()
-        results = resp.json().get("results", [])[:limit]
+        results = _search(params, headers, limit)
+        ids = [_opinion_id(r) for r in results]
+        with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+            texts = list(pool.map(lambda i: _fetch_opinion(i, headers) if i else "", ids))
 
-        for r in results:
-            content = r.get("snippet", "") or r.get("text", "")
+        for r, text in zip(results, texts):
+            # Without the full text, the search snippet is better than nothing
+            opinions = r.get("opinions") or [{}]
+            content = _excerpt(text) if text else (r.get("snippet") or opinions[0].get("snippet") or r.get("text", ""))
             if not content:
                 continue
             docs.append({
@@ -36,7 +121,7 @@ def scrape(ticker: str, company_name: str) -> list[dict]:
                 "source_url": f"https://www.courtlistener.com{r.get('absolute_url', '')}",
                 "document_date": r.get("dateFiled") or r.get("date_created", "")[:10] or None,
                 "title": r.get("caseName", "Court Opinion"),
-                "content": content[:8000]
+                "content": content[:MAX_CHARS]
             })
     except Exception as e:
         print(f"  [CourtListener] Error: {e}")
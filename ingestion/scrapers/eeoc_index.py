@@ -0,0 +1,262 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from scrapers import http_cache, http_client
+from scrapers.text import html_document, first, element_text
+
+BASE = "https://www.eeoc.gov"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Hera Research Bot)"}
+INDEX_ENABLED = os.getenv("EEOC_INDEX_ENABLED", "true").lower() in ("true", "1", "yes")
+MAX_AGE = float(os.getenv("EEOC_INDEX_MAX_AGE_HOURS", "24")) * 3600
+# Listing pages walked by the first crawl, resumed across runs until done;
+# updates stop at the first page with nothing new, which is usually page one
+CRAWL_PAGES = int(os.getenv("EEOC_CRAWL_PAGES", "50"))
+FETCH_WORKERS = int(os.getenv("EEOC_FETCH_WORKERS", "4"))
+# After a failed update, tickers keep searching what is indexed and the
+# crawl is retried this many seconds later rather than by every ticker
+RETRY_AFTER = 600
+
+BODY = "//*[contains(concat(' ', normalize-space(@class), ' '), ' field--name-body ')]"
+DATE = "//*[contains(concat(' ', normalize-space(@class), ' '), ' date-display-single ')]"
+# Releases live at /newsroom/<slug>; section and search pages don't have a dashed slug
+RELEASE_PATH = re.compile(r"^/newsroom/[a-z0-9]+(?:-[a-z0-9]+)+/?$")
+SUFFIXES = re.compile(r"\b(?:inc|incorporated|corp|corporation|co|company|ltd|llc|lp|plc|holdings)\b\.?", re.IGNORECASE)
+
+
+def release_url(href: str) -> str | None:
+    parts = urlsplit(href)
+    if parts.hostname not in (None, "www.eeoc.gov", "eeoc.gov") or parts.query:
+        return None
+    return f"{BASE}{parts.path.rstrip('/')}" if RELEASE_PATH.match(parts.path) else None
+
+
+def parse_release(url: str, page_html: str) -> dict | None:
+    root = html_document(page_html)
+    body = element_text(first(root, "//article", BODY, "//main"))
+    if len(body) <= 50:
+        return None
+    date_el = first(root, "//time", DATE)
+    raw = (date_el.get("datetime") or element_text(date_el)) if date_el is not None else ""
+    return {
+        "url": url,
+        "title": " ".join(element_text(first(root, "//h1", "//title")).split()) or "EEOC Press Release",
+        "date": raw[:10] or None,
+        "body": body,
+    }
+
+
+def match_query(company_name: str) -> str | None:
+    # "Acme Widgets, Inc." -> "acme widgets" as an FTS5 phrase
+    words = re.findall(r"\w+", SUFFIXES.sub(" ", company_name.replace("&", " and ")).lower())
+    return '"' + " ".join(words) + '"' if words else None
+
+
+class ReleaseIndex:
+    # EEOC press releases mirrored into SQLite with an FTS5 index over title
+    # and body. Company lookups search it instead of eeoc.gov.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._db = None
+        self._failed_at = 0.0
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS releases USING fts5(url UNINDEXED, date UNINDEXED, title, body)")
+            db.execute("CREATE TABLE IF NOT EXISTS crawl_state (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+            self._db = db
+        return self._db
+
+    def known(self, urls: list[str]) -> set[str]:
+        if not urls:
+            return set()
+        with self._lock:
+            rows = self._conn().execute(
+                f"SELECT url FROM releases WHERE url IN ({','.join('?' * len(urls))})", urls
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add(self, releases: list[dict]):
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT INTO releases (url, date, title, body) VALUES (?, ?, ?, ?)",
+                [(r["url"], r["date"], r["title"], r["body"]) for r in releases],
+            )
+            db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM releases").fetchone()[0]
+
+    def _state(self, key: str) -> float | None:
+        with self._lock:
+            row = self._conn().execute("SELECT value FROM crawl_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: float):
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO crawl_state VALUES (?, ?)", (key, value))
+            db.commit()
+
+    def updated_at(self) -> float:
+        return self._state("updated_at") or 0.0
+
+    def _mark_updated(self):
+        self._set_state("updated_at", time.time())
+
+    def backfill_page(self) -> int | None:
+        # Next listing page for the first crawl to walk, None once it has
+        # reached the oldest one
+        if self._state("backfill_done"):
+            return None
+        return int(self._state("backfill_page") or 0)
+
+    def set_backfill_page(self, page: int):
+        self._set_state("backfill_page", page)
+
+    def finish_backfill(self):
+        self._set_state("backfill_done", 1)
+
+    def search(self, company_name: str, limit: int) -> list[dict]:
+        query = match_query(company_name)
+        if not query:
+            return []
+        # A company named in the headline outranks one mentioned in passing
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT url, date, title, body FROM releases WHERE releases MATCH ? "
+                "ORDER BY bm25(releases, 0, 0, 10.0, 1.0), date DESC LIMIT ?",
+                (query, limit),
+            ).fetchall()
+        return [{"url": u, "date": d, "title": t, "body": b} for u, d, t, b in rows]
+
+    def _due(self, max_age: float) -> bool:
+        return time.time() - self.updated_at() >= max_age and time.time() - self._failed_at >= RETRY_AFTER
+
+    def _crawl(self, max_pages: int) -> int:
+        try:
+            added = crawl(self, max_pages)
+        except Exception:
+            self._failed_at = time.time()
+            raise
+        self._mark_updated()
+        return added
+
+    def update(self, max_age: float = MAX_AGE, max_pages: int = CRAWL_PAGES) -> int:
+        # Blocking update for the CLI and cron
+        with self._update_lock:
+            return self._crawl(max_pages) if self._due(max_age) else 0
+
+    def refresh_in_background(self, max_age: float = MAX_AGE, max_pages: int = CRAWL_PAGES):
+        # Scrapers call this and go on searching what is already indexed; at
+        # most one crawl runs at a time, however many tickers ask.
+        if not self._due(max_age) or not self._update_lock.acquire(blocking=False):
+            return
+        if not self._due(max_age):
+            self._update_lock.release()
+            return
+
+        def run():
+            try:
+                self._crawl(max_pages)
+            except Exception as e:
+                print(f"  [EEOC] Index update failed: {e}")
+            finally:
+                self._update_lock.release()
+
+        threading.Thread(target=run, name="eeoc-crawl", daemon=True).start()
+
+
+def _fetch_release(url: str) -> tuple[dict | None, bool]:
+    # (release, fetched): a page that loads but isn't a release is not a failure
+    try:
+        # The index is the cache for release pages
+        resp = http_client.get(url, headers=HEADERS, timeout=20, cache_ttl=0)
+        resp.raise_for_status()
+        return parse_release(url, resp.text), True
+    except Exception as e:
+        print(f"  [EEOC] Failed to fetch {url}: {e}")
+        return None, False
+
+
+def _crawl_page(index: ReleaseIndex, pool: ThreadPoolExecutor, page: int) -> tuple[int, int]:
+    # Returns (release links on the page, releases added)
+    resp = http_client.get(f"{BASE}/newsroom/search", params={"page": page},
+                           headers=HEADERS, timeout=30, cache_ttl=0)
+    resp.raise_for_status()
+    urls = []
+    for a in html_document(resp.text).xpath("//a[@href]"):
+        url = release_url(a.get("href"))
+        if url and url not in urls:
+            urls.append(url)
+    known = index.known(urls)
+    new = [url for url in urls if url not in known]
+    results = list(pool.map(_fetch_release, new))
+    if new and not any(fetched for _, fetched in results):
+        raise RuntimeError(f"none of the {len(new)} new releases on listing page {page} could be fetched")
+    releases = [r for r, _ in results if r]
+    if releases:
+        index.add(releases)
+    return len(urls), len(releases)
+
+
+def crawl(index: ReleaseIndex, max_pages: int) -> int:
+    # Listing pages run newest first. Updates walk from the top and stop at
+    # the first page that adds nothing; until the first crawl has reached the
+    # oldest page, each crawl also carries on from where the last one stopped.
+    added = 0
+    backfill = index.backfill_page()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        if backfill != 0:
+            for page in range(max_pages):
+                _, page_added = _crawl_page(index, pool, page)
+                added += page_added
+                if not page_added:
+                    break
+        if backfill is not None:
+            for page in range(backfill, max_pages):
+                links, page_added = _crawl_page(index, pool, page)
+                added += page_added
+                if not links:
+                    break
+                index.set_backfill_page(page + 1)
+            index.finish_backfill()
+    print(f"  [EEOC] Index update added {added} releases")
+    return added
+
+
+_index = ReleaseIndex(os.path.join(http_cache.CACHE_DIR, "eeoc.sqlite")) if INDEX_ENABLED else None
+
+
+def get_index() -> ReleaseIndex | None:
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror EEOC press releases into the local search index")
+    parser.add_argument("--pages", type=int, default=CRAWL_PAGES, help="Listing pages to walk at most")
+    parser.add_argument("names", nargs="*", help="Company names to search for after updating")
+    args = parser.parse_args()
+    index = _index or ReleaseIndex(os.path.join(http_cache.CACHE_DIR, "eeoc.sqlite"))
+    index._failed_at = 0.0
+    index.update(max_age=0, max_pages=args.pages)
+    print(f"{index.count()} releases indexed")
+    for name in args.names:
+        for r in index.search(name, 5):
+            print(f"{name}: {r['date']} {r['title']} {r['url']}")
+
+
+if __name__ == "__main__":
+    main()
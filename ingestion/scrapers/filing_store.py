@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from scrapers import http_cache
+
+STORE_ENABLED = os.getenv("SEC_FILING_STORE_ENABLED", "true").lower() in ("true", "1", "yes")
+
+
+class FilingStore:
+    # Full filing text keyed by accession number (or any other document that
+    # never changes once filed, such as a court opinion by opinion ID), so
+    # entries have no TTL; re-runs only download new filings.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS filings (
+                    accession TEXT PRIMARY KEY,
+                    form TEXT,
+                    text BLOB NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._db = db
+        return self._db
+
+    def get(self, accession: str) -> str | None:
+        with self._lock:
+            row = self._conn().execute("SELECT text FROM filings WHERE accession = ?", (accession,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, accession: str, form: str, text: str):
+        blob = zlib.compress(text.encode("utf-8"))
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?)", (accession, form, blob, time.time()))
+            db.commit()
+
+
+_store = FilingStore(os.path.join(http_cache.CACHE_DIR, "sec_filings.sqlite")) if STORE_ENABLED else None
+
+
+def filing_text(filing) -> str:
+    accession = getattr(filing, "accession_no", None) or getattr(filing, "accession_number", None)
+    if not _store or not accession:
+        return filing.text() or ""
+    try:
+        text = _store.get(accession)
+    except sqlite3.Error as e:
+        print(f"  [SEC EDGAR] Filing store lookup failed: {e}")
+        return filing.text() or ""
+    if text is not None:
+        return text
+    text = filing.text() or ""
+    if text:
+        try:
+            _store.put(accession, getattr(filing, "form", None), text)
+        except sqlite3.Error as e:
+            print(f"  [SEC EDGAR] Filing store write failed: {e}")
+    return text
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = os.getenv("HERA_CACHE_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Seconds a cached response is served without asking upstream, keyed like
+# http_client.HOST_LIMITS. Press releases and filed opinions practically never
+# change; news and Reddit move fast.
+SOURCE_TTLS = {
+    "newsapi.org": 6 * 3600,
+    "reddit.com": 3600,
+    "wikipedia.org": 24 * 3600,
+    "eeoc.gov": 30 * 86400,
+    "courtlistener.com": 30 * 86400,
+}
+DEFAULT_TTL = 3600
+
+# Credentials never become part of the cache key
+SECRET_PARAMS = {"apikey", "api_key", "token", "key"}
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def cache_key(url: str, params=None) -> str:
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        query += [(k, str(v)) for k, v in items if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+    normalized = f"GET {parts.scheme.lower()}://{(parts.hostname or '').lower()}{parts.path or '/'}?{urlencode(query)}"
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._size = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def lookup(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT url, status, headers, body, etag, last_modified, expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[6] <= now:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if row is None:
+                return None
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        url, status, headers, body, etag, last_modified, expires_at = row
+        return {
+            "url": url, "status": status, "headers": json.loads(headers), "body": body,
+            "etag": etag, "last_modified": last_modified, "fresh": expires_at > now,
+        }
+
+    def store(self, key: str, resp: requests.Response, ttl: float):
+        headers = {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers}
+        body = resp.content
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, resp.url, resp.status_code, json.dumps(headers), body,
+                 headers.get("ETag"), headers.get("Last-Modified"), now + ttl, now, len(body)),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            self.stores += 1
+            self._evict(db)
+            db.commit()
+
+    def touch(self, key: str, ttl: float):
+        # Upstream answered 304 Not Modified: the stored body is good for another TTL
+        with self._lock:
+            db = self._conn()
+            now = time.time()
+            db.execute("UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?", (now + ttl, now, key))
+            db.commit()
+            self.revalidated += 1
+
+    def _evict(self, db):
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if self._size <= target:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "stores": self.stores, "evictions": self.evictions, "bytes": self._size,
+            }
+
+
+def to_response(entry: dict) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.url = entry["url"]
+    resp.headers = CaseInsensitiveDict(entry["headers"])
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp._content = entry["body"]
+    resp.from_cache = True
+    return resp
+
+
+def ttl_for(host_key: str) -> float:
+    return SOURCE_TTLS.get(host_key, DEFAULT_TTL)
+
+
+_cache = ResponseCache(os.path.join(CACHE_DIR, "http.sqlite"), MAX_BYTES) if CACHE_ENABLED else None
+
+
+def get_cache() -> ResponseCache | None:
+    return _cache
+
+
+def stats() -> dict:
+    return _cache.stats() if _cache else {}
@@ -0,0 +1,211 @@
+import email.utils
+import os
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapers import http_cache
+
+# (requests per second, burst) per upstream. Hosts are matched by suffix, so
+# "reddit.com" covers www.reddit.com and oauth.reddit.com.
+HOST_LIMITS = {
+    "newsapi.org": (1.0, 2),
+    "reddit.com": (1.0, 4),
+    "wikipedia.org": (5.0, 10),
+    "eeoc.gov": (2.0, 4),
+    "courtlistener.com": (1.0, 3),
+}
+DEFAULT_LIMIT = (5.0, 5)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# A Retry-After longer than this means "come back later", not "retry now"
+MAX_RETRY_AFTER = 60.0
+# Hosts that report their quota (X-Ratelimit-Remaining/Reset, as Reddit does)
+# are paced by it, but never faster than this
+HEADER_RATE_MAX = float(os.getenv("HTTP_HEADER_RATE_MAX", "10"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token even if it isn't there yet; the deficit is how
+            # long this caller has to wait, which keeps waiters in FIFO order.
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, self._blocked_until - now, 0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def adapt(self, remaining: float, reset: float):
+        # Spread what is left of upstream's window over the time until it
+        # resets, instead of spending it at a fixed rate and hitting a 429.
+        # No wait runs past MAX_RETRY_AFTER: beyond that upstream answers 429
+        # and _fetch hands it back to the caller, like a long Retry-After.
+        with self._lock:
+            if remaining < 1:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + min(reset, MAX_RETRY_AFTER))
+                return
+            self.rate = min(HEADER_RATE_MAX, max(remaining / max(reset, 1.0), 1.0 / MAX_RETRY_AFTER))
+            self._tokens = min(self._tokens, remaining)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+_lock = threading.Lock()
+_buckets: dict[str, TokenBucket] = {}
+_sessions: dict[str, requests.Session] = {}
+
+
+def _host_key(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    for suffix in HOST_LIMITS:
+        if host == suffix or host.endswith("." + suffix):
+            return suffix
+    return host
+
+
+def _bucket(key: str) -> TokenBucket:
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*HOST_LIMITS.get(key, DEFAULT_LIMIT))
+        return _buckets[key]
+
+
+def _session(key: str) -> requests.Session:
+    with _lock:
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _quota(resp: requests.Response) -> tuple[float, float] | None:
+    remaining = resp.headers.get("X-Ratelimit-Remaining")
+    reset = resp.headers.get("X-Ratelimit-Reset")
+    if remaining is None or reset is None:
+        return None
+    try:
+        remaining, reset = float(remaining), float(reset)
+    except ValueError:
+        return None
+    if reset > 1e9:
+        # Some APIs send the reset as an epoch timestamp
+        reset -= time.time()
+    return remaining, max(0.0, reset)
+
+
+def _backoff(attempt: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def get(url: str, params=None, headers=None, timeout: float = 30, retries: int | None = None,
+        cache_ttl: float | None = None) -> requests.Response:
+    key = _host_key(url)
+    cache = http_cache.get_cache()
+    ttl = http_cache.ttl_for(key) if cache_ttl is None else cache_ttl
+    if not cache or ttl <= 0:
+        return _fetch(key, url, params, headers, timeout, retries)
+
+    cache_key = http_cache.cache_key(url, params)
+    try:
+        entry = cache.lookup(cache_key)
+    except (sqlite3.Error, OSError) as e:
+        print(f"  [HTTP cache] Lookup failed, fetching upstream: {e}")
+        return _fetch(key, url, params, headers, timeout, retries)
+    if entry and entry["fresh"]:
+        return http_cache.to_response(entry)
+
+    if entry:
+        # Expired: ask upstream whether our copy is still current
+        headers = dict(headers or {})
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    resp = _fetch(key, url, params, headers, timeout, retries)
+    try:
+        if entry and resp.status_code == 304:
+            cache.touch(cache_key, ttl)
+            return http_cache.to_response(entry)
+        if entry and resp.status_code in RETRY_STATUSES:
+            # Upstream is throttling or down; an expired copy beats nothing
+            return http_cache.to_response(entry)
+        if resp.status_code == 200:
+            cache.store(cache_key, resp, ttl)
+    except (sqlite3.Error, OSError) as e:
+        print(f"  [HTTP cache] Store failed: {e}")
+    return resp
+
+
+def _fetch(key: str, url: str, params, headers, timeout: float, retries: int | None) -> requests.Response:
+    retries = MAX_RETRIES if retries is None else retries
+    bucket = _bucket(key)
+    session = _session(key)
+
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            resp = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        quota = _quota(resp)
+        if quota:
+            bucket.adapt(*quota)
+        if resp.status_code not in RETRY_STATUSES or attempt == retries:
+            return resp
+
+        delay = _retry_after(resp)
+        if delay is None:
+            delay = _backoff(attempt)
+        elif delay > MAX_RETRY_AFTER:
+            return resp
+        if resp.status_code == 429:
+            # Hold back every thread talking to this host, not just this one
+            bucket.pause(delay)
+        time.sleep(delay)
+
+    return resp
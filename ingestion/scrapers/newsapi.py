@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import requests
+
+from scrapers import http_client, http_cache
+
+API_URL = "https://newsapi.org/v2/everything"
+# Developer plan allows 100 requests/day; keep a few back for manual checks
+DAILY_LIMIT = int(os.getenv("NEWS_DAILY_LIMIT", "100"))
+QUOTA_RESERVE = int(os.getenv("NEWS_QUOTA_RESERVE", "5"))
+QUOTA_PATH = os.path.join(http_cache.CACHE_DIR, "newsapi_quota.sqlite")
+PLAN_TTL = 600
+
+# The news, glassdoor_proxy and twitter scrapers used to send four separate
+# /v2/everything calls per company. They are planned here as one OR-ed query;
+# each returned article is then assigned to the most specific source type
+# whose keywords it matches, so no article is stored twice.
+SOURCE_TYPES = ["news_article", "glassdoor_proxy", "social_news"]
+# Most specific first: Glassdoor and social-media stories are nearly always
+# about harassment or lawsuits too, so the news keywords would claim them all
+CLASSIFY_ORDER = ["glassdoor_proxy", "social_news", "news_article"]
+CLAUSES = {
+    "news_article": "harassment OR discrimination OR lawsuit OR settlement",
+    "glassdoor_proxy": 'glassdoor AND (review OR "workplace culture" OR harassment OR discrimination)',
+    "social_news": '(twitter OR "social media") AND (backlash OR outcry OR viral OR employees OR protest OR walkout)',
+}
+KEYWORDS = {
+    "news_article": [["harassment", "discrimination", "lawsuit", "settlement"]],
+    "glassdoor_proxy": [["glassdoor"]],
+    "social_news": [["twitter", "social media"], ["backlash", "outcry", "viral", "employees", "protest", "walkout"]],
+}
+CAPS = {"glassdoor_proxy": 10, "social_news": 10}
+
+
+def api_key() -> str:
+    return os.getenv("NEWS_API_KEY", "")
+
+
+class Quota:
+    # The daily count lives in SQLite and every change is a single conditional
+    # UPDATE, so the worker and concurrent CLI runs share one count instead of
+    # each holding its own and overwriting the others'.
+    def __init__(self, path: str, limit: int, reserve: int):
+        self.path = path
+        self.limit = limit
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _today(self) -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, used INTEGER NOT NULL)")
+            self._db = db
+        return self._db
+
+    def _update(self, sql: str, *args) -> bool:
+        today = self._today()
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM quota WHERE day <> ?", (today,))
+            db.execute("INSERT OR IGNORE INTO quota VALUES (?, 0)", (today,))
+            changed = db.execute(sql, (*args, today)).rowcount
+            db.commit()
+        return changed > 0
+
+    def try_acquire(self) -> bool:
+        return self._update("UPDATE quota SET used = used + 1 WHERE used < ? AND day = ?", self.limit - self.reserve)
+
+    def refund(self):
+        # Cache hits never reached NewsAPI
+        self._update("UPDATE quota SET used = MAX(0, used - 1) WHERE day = ?")
+
+    def exhaust(self):
+        self._update("UPDATE quota SET used = ? WHERE day = ?", self.limit)
+
+    def used(self) -> int:
+        with self._lock:
+            row = self._conn().execute("SELECT used FROM quota WHERE day = ?", (self._today(),)).fetchone()
+        return row[0] if row else 0
+
+
+quota = Quota(QUOTA_PATH, DAILY_LIMIT, QUOTA_RESERVE)
+
+_plans_lock = threading.Lock()
+_plans: dict[tuple, tuple[float, Future]] = {}
+
+
+def _classify(article: dict) -> list[str]:
+    # Every source type the article fits, most specific first
+    text = f"{article.get('title') or ''} {article.get('description') or ''} {article.get('content') or ''}".lower()
+    matches = [t for t in CLASSIFY_ORDER if all(any(word in text for word in group) for group in KEYWORDS[t])]
+    # NewsAPI matched on the full article body we don't get to see; the plain
+    # news bucket is the closest fit.
+    return matches or ["news_article"]
+
+
+def _from_date(watermarks: dict | None) -> str | None:
+    # One query serves all three source types, so it can only start at the
+    # oldest of their watermarks, and only if every type has one.
+    dates = [(watermarks or {}).get(source_type) for source_type in SOURCE_TYPES]
+    if not all(dates):
+        return None
+    return min(dates)[:10]
+
+
+def _fetch(company_name: str, from_date: str | None) -> dict[str, list[dict]]:
+    buckets = {source_type: [] for source_type in SOURCE_TYPES}
+    caps = {"news_article": int(os.getenv("NEWS_LIMIT", "10")), **CAPS}
+    query = f'"{company_name}" AND ({" OR ".join(f"({CLAUSES[t]})" for t in SOURCE_TYPES)})'
+    params = {"q": query, "sortBy": "relevancy", "pageSize": min(100, sum(caps.values())), "apiKey": api_key()}
+    if from_date:
+        params["from"] = from_date
+    # Every attempt counts against the quota, so the one retry is made here
+    # rather than by http_client. A NewsAPI 429 means the plan quota is gone;
+    # retrying that only burns time.
+    for attempt in range(2):
+        if not quota.try_acquire():
+            print(f"  [NewsAPI client] Daily quota reached ({quota.used()}/{DAILY_LIMIT}), skipping")
+            return buckets
+        try:
+            resp = http_client.get(API_URL, params=params, timeout=30, retries=0)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt:
+                raise
+            continue
+        if getattr(resp, "from_cache", False):
+            quota.refund()
+        if resp.status_code not in (500, 502, 503, 504) or attempt:
+            break
+        time.sleep(http_client.BACKOFF_BASE)
+    if resp.status_code in (426, 429):
+        quota.exhaust()
+        print(f"  [NewsAPI client] Quota exhausted upstream ({resp.status_code}), skipping NewsAPI for today")
+        return buckets
+    if resp.status_code == 401:
+        print("  [NewsAPI client] Auth error (401), skipping")
+        return buckets
+    resp.raise_for_status()
+
+    seen = set()
+    for a in resp.json().get("articles", []):
+        url = a.get("url")
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        # A full bucket passes the article on to the next type it fits
+        for source_type in _classify(a):
+            if len(buckets[source_type]) < caps[source_type]:
+                buckets[source_type].append(a)
+                break
+    return buckets
+
+
+def articles_for(company_name: str, source_type: str, watermarks: dict | None = None) -> list[dict]:
+    # The three scrapers for a company run in parallel; the first one to ask
+    # sends the request and the others wait on the same future.
+    from_date = _from_date(watermarks)
+    key = (company_name, from_date)
+    now = time.monotonic()
+    with _plans_lock:
+        for k in [k for k, (at, _) in _plans.items() if now - at > PLAN_TTL]:
+            del _plans[k]
+        entry = _plans.get(key)
+        owner = entry is None
+        if owner:
+            entry = (now, Future())
+            _plans[key] = entry
+    future = entry[1]
+
+    if owner:
+        try:
+            future.set_result(_fetch(company_name, from_date))
+        except Exception as e:
+            future.set_exception(e)
+            with _plans_lock:
+                _plans.pop(key, None)
+
+    since = (watermarks or {}).get(source_type)
+    articles = future.result()[source_type]
+    if since:
+        articles = [a for a in articles if (a.get("publishedAt") or "")[:10] >= since[:10]]
+    return articles
+
+
+def to_docs(articles: list[dict], ticker: str, company_name: str, source_type: str, default_title: str) -> list[dict]:
+    docs = []
+    for a in articles:
+        content = f"{a.get('title', '')}\n\n{a.get('description', '')}\n\n{a.get('content', '')}"
+        if len(content.strip()) < 50:
+            continue
+        docs.append({
+            "company_ticker": ticker,
+            "company_name": company_name,
+            "source_type": source_type,
+            "source_url": a.get("url", ""),
+            "document_date": (a.get("publishedAt") or "")[:10] or None,
+            "title": a.get("title", default_title),
+            "content": content[:8000],
+        })
+    return docs
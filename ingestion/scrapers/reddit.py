@@ -1,81 +1,78 @@
 import os
-import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
+from scrapers import http_client
 
 HEADERS = {"User-Agent": "hera:v1.0 (accountability research)"}
 
-def scrape(ticker: str, company_name: str) -> list[dict]:
-    post_limit = int(os.getenv("REDDIT_POST_LIMIT", "5"))
-    comment_limit = int(os.getenv("REDDIT_COMMENT_LIMIT", "3"))
-    docs = []
-    query = f'"{company_name}" (harassment OR discrimination OR toxic OR lawsuit OR workplace)'
+SUBREDDITS = ["news", "technology"]
+COMMENT_WORKERS = int(os.getenv("REDDIT_COMMENT_WORKERS", "3"))
 
-    # Global search
+
+def _search(url: str, params: dict, label: str) -> dict | None:
+    # http_client paces requests by Reddit's quota headers and retries 429s;
+    # one that still fails costs only this search, not the whole source
     try:
-        resp = requests.get(
-            "https://www.reddit.com/search.json",
-            params={"q": query, "sort": "relevance", "limit": post_limit},
-            headers=HEADERS, timeout=15
-        )
+        resp = http_client.get(url, params=params, headers=HEADERS, timeout=15)
         if resp.status_code == 429:
-            print("  [Reddit] Rate limited on global search, skipping")
-            return docs
+            print(f"  [Reddit] Rate limited on {label}, skipping it")
+            return None
         if resp.status_code == 200:
-            _extract_posts(resp.json(), ticker, company_name, docs)
-        time.sleep(1)
+            return resp.json()
     except Exception as e:
-        print(f"  [Reddit] Global search error: {e}")
+        print(f"  [Reddit] {label} error: {e}")
+    return None
+
+
+def _top_comments(post_id: str) -> list[str]:
+    try:
+        resp = http_client.get(f"https://www.reddit.com/comments/{post_id}.json", headers=HEADERS, timeout=15)
+        if resp.status_code != 200:
+            return []
+        data = resp.json()
+    except Exception:
+        return []
+    comments = []
+    if len(data) > 1:
+        for child in data[1].get("data", {}).get("children", [])[:5]:
+            body = child.get("data", {}).get("body", "")
+            if body and body != "[deleted]":
+                comments.append(body)
+    return comments
 
-    # Subreddit searches — only r/news and r/technology for speed
-    for sub in ["news", "technology"]:
-        try:
-            resp = requests.get(
-                f"https://www.reddit.com/r/{sub}/search.json",
-                params={"q": f'"{company_name}"', "restrict_sr": "on", "limit": post_limit},
-                headers=HEADERS, timeout=15
-            )
-            if resp.status_code == 429:
-                print(f"  [Reddit] Rate limited on r/{sub}, stopping subreddit searches")
-                break
-            if resp.status_code == 200:
-                _extract_posts(resp.json(), ticker, company_name, docs)
-            time.sleep(1)
-        except Exception:
-            continue
 
-    # Fetch top comments for high-scoring posts
+def scrape(ticker: str, company_name: str) -> list[dict]:
+    post_limit = int(os.getenv("REDDIT_POST_LIMIT", "5"))
+    comment_limit = int(os.getenv("REDDIT_COMMENT_LIMIT", "3"))
+    docs = []
+    query = f'"{company_name}" (harassment OR discrimination OR toxic OR lawsuit OR workplace)'
+
+    # Global search and the subreddit searches (only r/news and r/technology,
+    # for speed) run at once; results keep that order
+    searches = [("https://www.reddit.com/search.json",
+                 {"q": query, "sort": "relevance", "limit": post_limit}, "global search")]
+    searches += [(f"https://www.reddit.com/r/{sub}/search.json",
+                  {"q": f'"{company_name}"', "restrict_sr": "on", "limit": post_limit}, f"r/{sub}")
+                 for sub in SUBREDDITS]
+    with ThreadPoolExecutor(max_workers=len(searches)) as pool:
+        for data in pool.map(lambda s: _search(*s), searches):
+            if data:
+                _extract_posts(data, ticker, company_name, docs)
+
+    # Top comments for high-scoring posts, a few posts at a time
+    candidates = []
     seen_ids = set()
-    comments_fetched = 0
     for doc in docs[:post_limit]:
-        if comments_fetched >= comment_limit:
-            break
         post_id = doc.get("_post_id")
-        if not post_id or post_id in seen_ids:
+        if not post_id or post_id in seen_ids or doc.get("_score", 0) < 10:
             continue
         seen_ids.add(post_id)
-        if doc.get("_score", 0) < 10:
-            continue
-        try:
-            resp = requests.get(
-                f"https://www.reddit.com/comments/{post_id}.json",
-                headers=HEADERS, timeout=15
-            )
-            if resp.status_code == 429:
-                break
-            if resp.status_code == 200:
-                data = resp.json()
-                if len(data) > 1:
-                    comments = []
-                    for child in data[1].get("data", {}).get("children", [])[:5]:
-                        body = child.get("data", {}).get("body", "")
-                        if body and body != "[deleted]":
-                            comments.append(body)
-                    if comments:
-                        doc["content"] += "\n\n--- Top Comments ---\n" + "\n---\n".join(comments)
-                        comments_fetched += 1
-            time.sleep(1)
-        except Exception:
-            continue
+        candidates.append(doc)
+    candidates = candidates[:comment_limit]
+    if candidates:
+        with ThreadPoolExecutor(max_workers=max(1, min(COMMENT_WORKERS, len(candidates)))) as pool:
+            for doc, comments in zip(candidates, pool.map(lambda d: _top_comments(d["_post_id"]), candidates)):
+                if comments:
+                    doc["content"] += "\n\n--- Top Comments ---\n" + "\n---\n".join(comments)
 
     # Clean internal fields
     for doc in docs:
@@ -1,95 +1,131 @@
 import os
-from edgar import Company
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import edgar
+from edgar import Company, Filing
+from scrapers import filing_store, sec_sections
 
-def scrape(ticker: str) -> list[dict]:
-    limit = int(os.getenv("SEC_FILING_LIMIT", "3"))
-    docs = []
-    try:
-        company = Company(ticker)
-        name = company.name
-        if not name or "Entity" in name:
-            return docs
-    except Exception:
-        return docs
+edgar.set_identity("Hera Research hera@example.com")
+
+FETCH_WORKERS = int(os.getenv("SEC_FETCH_WORKERS", "4"))
+RELEVANT_8K = [
+    "item 5.02", "item 8.01", "item 2.06",
+    "harassment", "discrimination", "settlement", "termination"
+]
+ITEMS_8K = ["5.02", "8.01", "2.06"]
+PROXY_KEYWORDS = ["human capital", "diversity", "harassment", "workplace", "employee"]
+
+# A Company loads its filings index once, so it is only shared for the length
+# of a ticker's run; long-lived processes (worker.py) then see new filings
+COMPANY_TTL = 300
+
+_companies: dict[str, tuple[float, Company]] = {}
+_companies_lock = threading.Lock()
+
+def company(ticker: str) -> Company:
+    # Shared by run.get_company_name and scrape so a run looks a ticker up once
+    now = time.monotonic()
+    with _companies_lock:
+        for key in [k for k, (at, _) in _companies.items() if now - at > COMPANY_TTL]:
+            del _companies[key]
+        entry = _companies.get(ticker)
+    if entry:
+        return entry[1]
+    c = Company(ticker)
+    with _companies_lock:
+        _companies[ticker] = (now, c)
+    return c
+
+def _filed_after(watermarks: dict | None, source_type: str) -> str | None:
+    # edgartools takes "YYYY-MM-DD:" as an open-ended filing date range; start
+    # the day after the newest filing we already hold.
+    since = (watermarks or {}).get(source_type)
+    if not since:
+        return None
+    return f"{date.fromisoformat(since[:10]) + timedelta(days=1)}:"
 
-    # 8-K filings
+def _get_filings(company, form: str, watermarks: dict | None, source_type: str):
+    filed_after = _filed_after(watermarks, source_type)
+    if filed_after:
+        return company.get_filings(form=form, filing_date=filed_after)
+    return company.get_filings(form=form)
+
+def _latest(company, form: str, watermarks: dict | None, source_type: str, n: int) -> list:
     try:
-        filings_8k = company.get_filings(form="8-K").latest(limit)
-        for f in filings_8k:
-            try:
-                text = f.text()[:8000]
-                relevant_items = any(item in text.lower() for item in [
-                    "item 5.02", "item 8.01", "item 2.06",
-                    "harassment", "discrimination", "settlement", "termination"
-                ])
-                if relevant_items or len(docs) < 2:
-                    docs.append({
-                        "company_ticker": ticker,
-                        "company_name": name,
-                        "source_type": "sec_8k",
-                        "source_url": f.homepage_url or f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type=8-K",
-                        "document_date": str(f.filing_date) if f.filing_date else None,
-                        "title": f"8-K Filing - {f.filing_date}",
-                        "content": text
-                    })
-            except Exception:
-                continue
+        filings = _get_filings(company, form, watermarks, source_type).latest(n)
     except Exception:
-        pass
+        return []
+    if not filings:
+        return []
+    # latest(1) hands back a single Filing rather than a collection
+    return [filings] if isinstance(filings, Filing) else list(filings)
 
-    # 10-K Risk Factors + Legal Proceedings
+def _text(filing) -> str | None:
     try:
-        filing_10k = company.get_filings(form="10-K").latest(1)
-        if filing_10k:
-            f = filing_10k[0] if hasattr(filing_10k, '__getitem__') else filing_10k
-            try:
-                text = f.text()[:15000]
-                sections = []
-                for keyword in ["risk factors", "legal proceedings", "human capital"]:
-                    idx = text.lower().find(keyword)
-                    if idx >= 0:
-                        sections.append(text[max(0, idx - 100):idx + 5000])
-                content = "\n\n---\n\n".join(sections) if sections else text[:8000]
-                docs.append({
-                    "company_ticker": ticker,
-                    "company_name": name,
-                    "source_type": "sec_10k",
-                    "source_url": f.homepage_url or f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type=10-K",
-                    "document_date": str(f.filing_date) if f.filing_date else None,
-                    "title": f"10-K Annual Report - {f.filing_date}",
-                    "content": content
-                })
-            except Exception:
-                pass
+        return filing_store.filing_text(filing)
     except Exception:
-        pass
+        return None
+
+def _doc(ticker: str, name: str, f, source_type: str, form: str, title: str, content: str) -> dict:
+    return {
+        "company_ticker": ticker,
+        "company_name": name,
+        "source_type": source_type,
+        "source_url": f.homepage_url or f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type={form}",
+        "document_date": str(f.filing_date) if f.filing_date else None,
+        "title": f"{title} - {f.filing_date}",
+        "content": content,
+    }
+
+def _sections(parts: list[str | None]) -> str:
+    return "\n\n---\n\n".join(p for p in parts if p)
 
-    # DEF 14A Proxy Statement
+def scrape(ticker: str, watermarks: dict | None = None) -> Iterator[dict]:
+    limit = int(os.getenv("SEC_FILING_LIMIT", "3"))
+    found = 0
     try:
-        filing_proxy = company.get_filings(form="DEF 14A").latest(1)
-        if filing_proxy:
-            f = filing_proxy[0] if hasattr(filing_proxy, '__getitem__') else filing_proxy
-            try:
-                text = f.text()[:15000]
-                sections = []
-                for keyword in ["human capital", "diversity", "harassment", "workplace", "employee"]:
-                    idx = text.lower().find(keyword)
-                    if idx >= 0:
-                        sections.append(text[max(0, idx - 100):idx + 3000])
-                if sections:
-                    docs.append({
-                        "company_ticker": ticker,
-                        "company_name": name,
-                        "source_type": "sec_proxy",
-                        "source_url": f.homepage_url or f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type=DEF+14A",
-                        "document_date": str(f.filing_date) if f.filing_date else None,
-                        "title": f"DEF 14A Proxy Statement - {f.filing_date}",
-                        "content": "\n\n---\n\n".join(sections)
-                    })
-            except Exception:
-                pass
+        c = company(ticker)
+        name = c.name
+        if not name or "Entity" in name:
+            return
     except Exception:
-        pass
+        return
+
+    jobs = (
+        [("sec_8k", f) for f in _latest(c, "8-K", watermarks, "sec_8k", limit)]
+        + [("sec_10k", f) for f in _latest(c, "10-K", watermarks, "sec_10k", 1)]
+        + [("sec_proxy", f) for f in _latest(c, "DEF 14A", watermarks, "sec_proxy", 1)]
+    )
+    # Filing bodies are the slow part; fetch them together (or read them from
+    # the accession-keyed store) and build documents in filing order.
+    kept_8k = 0
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix=f"sec-{ticker}") as pool:
+        for (source_type, f), text in zip(jobs, pool.map(lambda job: _text(job[1]), jobs)):
+            if not text:
+                continue
+            lowered = text.lower()
+            if source_type == "sec_8k":
+                relevant_items = any(item in lowered for item in RELEVANT_8K)
+                if not (relevant_items or kept_8k < 2):
+                    continue
+                content = _sections([sec_sections.item_section(text, item, 4000) for item in ITEMS_8K])[:8000] or text[:8000]
+                kept_8k += 1
+                yield _doc(ticker, name, f, source_type, "8-K", "8-K Filing", content)
+            elif source_type == "sec_10k":
+                content = _sections([
+                    sec_sections.item_section(text, "1A", 6000),
+                    sec_sections.item_section(text, "3", 4000),
+                    sec_sections.heading_section(text, "human capital", 4000),
+                ]) or text[:8000]
+                yield _doc(ticker, name, f, source_type, "10-K", "10-K Annual Report", content)
+            else:
+                windows = sec_sections.keyword_windows(text, PROXY_KEYWORDS, before=100, after=3000, max_chars=15000)
+                if not windows:
+                    continue
+                yield _doc(ticker, name, f, source_type, "DEF+14A", "DEF 14A Proxy Statement", _sections(windows))
+            found += 1
 
-    print(f"  [SEC EDGAR] Found {len(docs)} documents for {ticker}")
-    return docs
+    print(f"  [SEC EDGAR] Found {found} documents for {ticker}")
@@ -0,0 +1,70 @@
+import re
+
+# "Item 1A. Risk Factors", "ITEM 3 - LEGAL PROCEEDINGS", "Item 5.02 Departure of..."
+ITEM_HEADING = re.compile(r"^[ \t]*item[ \t]+(\d+(?:\.\d+)?[a-c]?)\b[ \t]*[.:\-–—]?", re.IGNORECASE | re.MULTILINE)
+SUBHEADING_MAX = 80
+
+
+def _items(text: str) -> list[tuple[str, int]]:
+    return [(m.group(1).upper(), m.start()) for m in ITEM_HEADING.finditer(text)]
+
+
+def item_section(text: str, item: str, max_chars: int) -> str | None:
+    # The same heading shows up in the table of contents and in the body.
+    # A TOC entry is followed almost at once by the next item, so the
+    # occurrence with the longest run up to the next heading is the real one.
+    headings = _items(text)
+    best = None
+    for i, (number, start) in enumerate(headings):
+        if number != item.upper():
+            continue
+        end = headings[i + 1][1] if i + 1 < len(headings) else len(text)
+        if best is None or end - start > best[1] - best[0]:
+            best = (start, end)
+    if best is None:
+        return None
+    section = text[best[0]:best[1]].strip()
+    return section[:max_chars] if len(section) > 200 else None
+
+
+def heading_section(text: str, title: str, max_chars: int) -> str | None:
+    # Sub-sections such as "Human Capital" inside Item 1: prefer a line that
+    # is just the heading, fall back to the first mention in running text.
+    lowered = text.lower()
+    start = None
+    for m in re.finditer(re.escape(title.lower()), lowered):
+        line_start = lowered.rfind("\n", 0, m.start()) + 1
+        line_end = lowered.find("\n", m.end())
+        line = lowered[line_start:line_end if line_end >= 0 else len(lowered)].strip()
+        if len(line) <= SUBHEADING_MAX:
+            start = line_start
+            break
+        if start is None:
+            start = m.start()
+    if start is None:
+        return None
+    next_item = ITEM_HEADING.search(text, start + len(title))
+    end = next_item.start() if next_item else len(text)
+    return text[start:min(end, start + max_chars)].strip()
+
+
+def keyword_windows(text: str, keywords: list[str], before: int, after: int, max_chars: int) -> list[str]:
+    # Text around the first hit of each keyword anywhere in the document,
+    # with overlapping windows merged, until max_chars is used up.
+    lowered = text.lower()
+    hits = [lowered.find(keyword) for keyword in keywords]
+    spans = sorted((max(0, i - before), i + after) for i in hits if i >= 0)
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    windows, used = [], 0
+    for start, end in merged:
+        if used >= max_chars:
+            break
+        window = text[start:min(end, start + max_chars - used)]
+        windows.append(window)
+        used += len(window)
+    return windows
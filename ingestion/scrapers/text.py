@@ -0,0 +1,142 @@
+import html
+import re
+
+# Markup that is dropped outright: bold/italic quotes, then comments, refs
+# (whole) and bare tags (their content stays). Each pattern opens with a
+# literal so the regex engine can skip ahead to candidates.
+QUOTES = re.compile(r"''+")
+DROPPED = re.compile(
+    r"<(?:!--.*?(?:-->|\Z)|ref\b[^<>]*?/>|ref\b[^<>/]*>.*?</ref\s*>|/?[a-zA-Z][\w-]*[^<>]*>)",
+    re.DOTALL | re.IGNORECASE,
+)
+# What's left needs nesting: template and table braces, link brackets and
+# external links, found in one forward scan
+TOKEN = re.compile(
+    r"(?=[{}|\[\]])(?:\{\{|\{\||\}\}|\|\}|\[\[|\]\]"
+    r"|\[(?:https?:)?//[^\]\s]{0,2000}(?: ([^\]\n]{0,500}))?\])"
+)
+# Fast paths for the common case, run in C before the scan: templates and
+# links with no braces or brackets inside. Removing one can't join the
+# characters around it into a new token unless it follows a brace or bracket
+# (or a "|" with a "}" after it), so those are left to the scan. A few passes
+# peel nested templates from the inside out; whatever is still nested deeper
+# goes to the scan.
+SIMPLE_TEMPLATE = re.compile(r"\{\{(?<![{}\[\]|]\{\{)[^{}]*\}\}|\{\{(?<=\|\{\{)[^{}]*\}\}(?!\})")
+SIMPLE_LINK = re.compile(r"\[\[(?<![{}\[\]]\[\[)([^\[\]{}]*)\]\]")
+TEMPLATE_PASSES = 3
+DROPPED_LINKS = ("file:", "image:", "category:", "media:")
+DROPPED_ELEMENTS = "//script|//style|//noscript"
+
+# Tabs and other odd spaces become plain spaces, then runs of spaces collapse
+ODD_SPACES = "\t\r\f\v\u00a0"
+SPACES = re.compile(f"[{ODD_SPACES}]+")
+RUNS = re.compile(r"  +")
+BLANK_LINES = re.compile(r"\n\n\n+")
+
+
+def normalize_whitespace(text: str) -> str:
+    # Runs of spaces become one, lines are trimmed and at most one blank line
+    # separates paragraphs, whichever parser produced the text.
+    if any(c in text for c in ODD_SPACES):
+        text = SPACES.sub(" ", text)
+    text = RUNS.sub(" ", text).replace(" \n", "\n").replace("\n ", "\n")
+    return BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _scan(text: str) -> str:
+    # Openers go to the output as text and onto a stack; a closer that matches
+    # the innermost open construct cuts its span back out (templates, tables)
+    # or replaces it with the label (links). Whatever never closes is simply
+    # left as written, so the scan only ever moves forward.
+    out = []
+    stack: list[tuple[str, int]] = []
+    open_templates = 0
+    pos = 0
+    while True:
+        m = TOKEN.search(text, pos)
+        if not m:
+            out.append(text[pos:])
+            break
+        out.append(text[pos:m.start()])
+        token = m.group()
+        pos = m.end()
+
+        if token in ("{{", "{|", "[["):
+            stack.append((token, len(out)))
+            out.append(token)
+            open_templates += token == "{{"
+        elif token == "}}" and open_templates:
+            # Links left open inside the template go with it
+            while True:
+                kind, mark = stack.pop()
+                if kind == "{{":
+                    break
+            open_templates -= 1
+            del out[mark:]
+        elif token == "|}" and stack and stack[-1][0] == "{|":
+            del out[stack.pop()[1]:]
+        elif token == "|}":
+            # Not closing a table, e.g. the "|" of "|}}": keep it and scan on
+            # from the "}"
+            out.append("|")
+            pos = m.start() + 1
+        elif token == "]]" and stack and stack[-1][0] == "[[":
+            mark = stack.pop()[1]
+            inner = "".join(out[mark + 1:])
+            del out[mark:]
+            # Nested links are already reduced to their labels, so the last
+            # pipe left separates target and label
+            if not inner.lstrip().lower().startswith(DROPPED_LINKS):
+                out.append(inner.rpartition("|")[2])
+        elif token.startswith("[") and token != "[[":
+            out.append(m.group(1) or "")
+        else:
+            out.append(token)
+    return "".join(out)
+
+
+def _label(m: re.Match) -> str:
+    inner = m.group(1)
+    return "" if inner.lstrip().lower().startswith(DROPPED_LINKS) else inner.rpartition("|")[2]
+
+
+def clean_wikitext(text: str) -> str:
+    # Quotes, refs, comments and tags go first, then simple templates and
+    # links; a single forward scan handles what is left (nested links, tables,
+    # deep templates and external links).
+    text = DROPPED.sub("", QUOTES.sub("", text))
+    for _ in range(TEMPLATE_PASSES):
+        text, removed = SIMPLE_TEMPLATE.subn("", text)
+        if not removed:
+            break
+    text = SIMPLE_LINK.sub(_label, text)
+    # Every construct the scan acts on opens with a brace or bracket
+    if "{" in text or "[" in text:
+        text = _scan(text)
+    return normalize_whitespace(html.unescape(text))
+
+
+def html_document(markup: str):
+    import lxml.html
+    if not markup or not markup.strip():
+        return lxml.html.fromstring("<html></html>")
+    root = lxml.html.document_fromstring(markup)
+    for el in root.xpath(DROPPED_ELEMENTS):
+        el.drop_tree()
+    return root
+
+
+def first(root, *xpaths: str):
+    for xpath in xpaths:
+        found = root.xpath(xpath)
+        if found:
+            return found[0]
+    return None
+
+
+def element_text(el) -> str:
+    # Each text node on its own line, like BeautifulSoup's
+    # get_text(separator="\n", strip=True), with whitespace normalized.
+    if el is None:
+        return ""
+    return normalize_whitespace("\n".join(s for s in (t.strip() for t in el.itertext()) if s))
@@ -1,9 +1,149 @@
 import os
-import requests
 import re
+import threading
+import time
+from concurrent.futures import Future
+from scrapers import http_client
+from scrapers.text import clean_wikitext
 
 HEADERS = {"User-Agent": "hera:v1.0 (accountability research)"}
+API_URL = "https://en.wikipedia.org/w/api.php"
 SECTION_KEYWORDS = ["controvers", "criticism", "lawsuit", "legal issue", "legal proceed", "litigation", "scandal"]
+# The query API takes up to 50 titles per request
+MAX_TITLES = 50
+# Titles asked for within this window share one request
+BATCH_WINDOW = 0.05
+PAGE_TTL = 600
+# Continuation requests followed per query before giving up on the rest
+MAX_CONTINUES = 10
+
+HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+
+_lock = threading.Lock()
+_pages: dict[str, tuple[float, Future]] = {}
+_queue: list[str] = []
+_leader = False
+
+
+def _query(titles: list[str]) -> dict[str, dict | None]:
+    # One request returns, per title, the canonical title, URL and full
+    # wikitext (after normalization and redirects). Past the API's response
+    # size limit the rest of the content comes in "continue" requests.
+    params = {
+        "action": "query", "prop": "revisions|info", "rvprop": "content", "rvslots": "main",
+        "inprop": "url", "redirects": 1, "titles": "|".join(titles),
+        "format": "json", "formatversion": 2,
+    }
+    renamed, pages = {}, {}
+    complete = False
+    for _ in range(MAX_CONTINUES):
+        resp = http_client.get(API_URL, params=params, headers=HEADERS, timeout=15)
+        resp.raise_for_status()
+        body = resp.json()
+        data = body.get("query", {})
+        renamed.update({n["from"]: n["to"] for n in data.get("normalized", [])})
+        renamed.update({r["from"]: r["to"] for r in data.get("redirects", [])})
+        for page in data.get("pages", []):
+            merged = pages.setdefault(page.get("title"), {})
+            merged.update({k: v for k, v in page.items() if k != "revisions" or v})
+        if "continue" not in body:
+            complete = True
+            break
+        params = {**params, **body["continue"]}
+
+    found = {}
+    for title in titles:
+        final = title
+        for _ in range(3):
+            final = renamed.get(final, final)
+        page = pages.get(final)
+        if page and not page.get("missing") and not page.get("revisions") and not complete:
+            # Content never arrived; leave it out so it isn't cached as a miss
+            continue
+        if not page or page.get("missing") or not page.get("revisions"):
+            found[title] = None
+            continue
+        found[title] = {
+            "title": page["title"],
+            "url": page.get("fullurl", ""),
+            "wikitext": page["revisions"][0].get("slots", {}).get("main", {}).get("content", ""),
+        }
+    return found
+
+
+def _register(name: str) -> tuple[Future, bool]:
+    now = time.monotonic()
+    for key in [k for k, (at, _) in _pages.items() if now - at > PAGE_TTL]:
+        del _pages[key]
+    entry = _pages.get(name)
+    if entry:
+        return entry[1], False
+    future = Future()
+    _pages[name] = (now, future)
+    _queue.append(name)
+    return future, True
+
+
+def _drain():
+    global _leader
+    with _lock:
+        names = list(_queue)
+        _queue.clear()
+        _leader = False
+    for i in range(0, len(names), MAX_TITLES):
+        chunk = names[i:i + MAX_TITLES]
+        try:
+            pages = _query(chunk)
+        except Exception as e:
+            with _lock:
+                futures = [_pages.pop(name)[1] for name in chunk if name in _pages]
+            for future in futures:
+                future.set_exception(e)
+            continue
+        with _lock:
+            futures = [(_pages[name][1], pages.get(name)) for name in chunk if name in pages and name in _pages]
+            incomplete = [_pages.pop(name)[1] for name in chunk if name not in pages and name in _pages]
+        for future, page in futures:
+            future.set_result(page)
+        for future in incomplete:
+            future.set_exception(RuntimeError("page content not returned by the API"))
+
+
+def _page(company_name: str) -> dict | None:
+    # Scrapers for different tickers run concurrently; the first to ask waits
+    # BATCH_WINDOW for others and sends all their titles in one query.
+    global _leader
+    with _lock:
+        future, added = _register(company_name)
+        lead = added and not _leader
+        if lead:
+            _leader = True
+    if lead:
+        time.sleep(BATCH_WINDOW)
+        _drain()
+    return future.result()
+
+
+def prefetch(company_names: list[str]):
+    # Portfolio runs: fetch every company's page up front in multi-title
+    # queries; scrape() then finds them already resolved.
+    with _lock:
+        for name in dict.fromkeys(company_names):
+            _register(name)
+    _drain()
+
+
+def split_sections(wikitext: str) -> list[tuple[str, int, str]]:
+    # (heading, level, text) for every section; a section's text runs to the
+    # next heading of the same or a higher level, so it includes subsections
+    # just like action=parse&section=N did.
+    headings = [(m.start(), m.end(), len(m.group(1)), m.group(2)) for m in HEADING.finditer(wikitext)]
+    sections = []
+    for i, (start, _, level, title) in enumerate(headings):
+        end = next((h[0] for h in headings[i + 1:] if h[2] <= level), len(wikitext))
+        sections.append((title, level, wikitext[start:end]))
+    return sections
+
 
 def scrape(ticker: str, company_name: str) -> list[dict]:
     if os.getenv("WIKIPEDIA_ENABLED", "true").lower() not in ("true", "1", "yes"):
@@ -11,97 +151,55 @@ def scrape(ticker: str, company_name: str) -> list[dict]:
         return []
 
     docs = []
-
-    # Get page summary to find the canonical title
     try:
-        resp = requests.get(
-            f"https://en.wikipedia.org/api/rest_v1/page/summary/{requests.utils.quote(company_name)}",
-            headers=HEADERS, timeout=15
-        )
-        if resp.status_code != 200:
-            print(f"  [Wikipedia] No page found for '{company_name}'")
-            return docs
-        summary = resp.json()
-        title = summary.get("title", company_name)
-        page_url = summary.get("content_urls", {}).get("desktop", {}).get("page", "")
+        page = _page(company_name)
     except Exception as e:
         print(f"  [Wikipedia] Error: {e}")
         return docs
+    if not page:
+        print(f"  [Wikipedia] No page found for '{company_name}'")
+        return docs
+    title, page_url, wikitext = page["title"], page["url"], page["wikitext"]
 
-    # Get sections list
-    try:
-        resp = requests.get(
-            "https://en.wikipedia.org/w/api.php",
-            params={"action": "parse", "page": title, "prop": "sections", "format": "json"},
-            headers=HEADERS, timeout=15
-        )
-        sections = resp.json().get("parse", {}).get("sections", [])
-    except Exception:
-        sections = []
-
-    # Find controversy/legal sections
-    target_indices = []
-    for s in sections:
-        line = s.get("line", "").lower()
-        if any(kw in line for kw in SECTION_KEYWORDS):
-            target_indices.append(s.get("index"))
-
-    if target_indices:
-        for idx in target_indices[:3]:
-            try:
-                resp = requests.get(
-                    "https://en.wikipedia.org/w/api.php",
-                    params={"action": "parse", "page": title, "prop": "wikitext", "section": idx, "format": "json"},
-                    headers=HEADERS, timeout=15
-                )
-                wikitext = resp.json().get("parse", {}).get("wikitext", {}).get("*", "")
-                clean = _clean_wikitext(wikitext)
-                if len(clean) > 100:
-                    section_name = next((s["line"] for s in sections if s.get("index") == idx), "Controversies")
-                    docs.append({
-                        "company_ticker": ticker,
-                        "company_name": company_name,
-                        "source_type": "wikipedia",
-                        "source_url": page_url,
-                        "document_date": None,
-                        "title": f"Wikipedia: {title} — {section_name}",
-                        "content": clean[:8000],
-                    })
-            except Exception:
-                continue
-    else:
-        # No controversy section — grab the full article text
-        try:
-            resp = requests.get(
-                "https://en.wikipedia.org/w/api.php",
-                params={"action": "parse", "page": title, "prop": "wikitext", "format": "json"},
-                headers=HEADERS, timeout=15
-            )
-            wikitext = resp.json().get("parse", {}).get("wikitext", {}).get("*", "")
-            clean = _clean_wikitext(wikitext)
-            if len(clean) > 100:
-                docs.append({
-                    "company_ticker": ticker,
-                    "company_name": company_name,
-                    "source_type": "wikipedia",
-                    "source_url": page_url,
-                    "document_date": None,
-                    "title": f"Wikipedia: {title}",
-                    "content": clean[:10000],
-                })
-        except Exception:
-            pass
+    # Find controversy/legal sections; a matching parent already covers its subsections
+    targets = []
+    covered_until = -1
+    for section_name, level, text in split_sections(wikitext):
+        if level <= covered_until:
+            covered_until = -1
+        if covered_until >= 0:
+            continue
+        if any(kw in section_name.lower() for kw in SECTION_KEYWORDS):
+            targets.append((section_name, text))
+            covered_until = level
+
+    for section_name, text in targets[:3]:
+        clean = clean_wikitext(text)
+        if len(clean) > 100:
+            docs.append({
+                "company_ticker": ticker,
+                "company_name": company_name,
+                "source_type": "wikipedia",
+                "source_url": page_url,
+                "document_date": None,
+                "title": f"Wikipedia: {title} — {clean_wikitext(section_name)}",
+                "content": clean[:8000],
+            })
+
+    if not targets:
+        # No controversy section — use the full article text
+        clean = clean_wikitext(wikitext)
+        if len(clean) > 100:
+            docs.append({
+                "company_ticker": ticker,
+                "company_name": company_name,
+                "source_type": "wikipedia",
+                "source_url": page_url,
+                "document_date": None,
+                "title": f"Wikipedia: {title}",
+                "content": clean[:10000],
+            })
 
     print(f"  [Wikipedia] Found {len(docs)} sections for {ticker}")
     return docs
 
-
-def _clean_wikitext(text: str) -> str:
-    text = re.sub(r'\{\{[^}]*\}\}', '', text)
-    text = re.sub(r'\[\[(?:[^|\]]*\|)?([^\]]*)\]\]', r'\1', text)
-    text = re.sub(r"'{2,}", '', text)
-    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.DOTALL)
-    text = re.sub(r'<ref[^/]*/>', '', text)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
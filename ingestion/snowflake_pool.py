@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size: int = 4, idle_check: float = 300):
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.idle_check = idle_check
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._idle: list[tuple[object, float]] = []
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        finally:
+            if conn is not None:
+                self._checkin(conn)
+            self._slots.release()
+
+    def warm(self, n: int = 1):
+        # Pay the login round trips up front (worker start-up) instead of on
+        # the first job.
+        conns = []
+        for _ in range(min(n, self.max_size)):
+            self._slots.acquire()
+            try:
+                conns.append(self._checkout())
+            except Exception:
+                self._slots.release()
+                raise
+        for conn in conns:
+            self._checkin(conn)
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused, "discarded": self.discarded, "idle": len(self._idle)}
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                conn = self._connect()
+                with self._lock:
+                    self.opened += 1
+                return conn
+            conn, last_used = item
+            if self._healthy(conn, last_used):
+                with self._lock:
+                    self.reused += 1
+                return conn
+            _close_quietly(conn)
+            with self._lock:
+                self.discarded += 1
+
+    def _checkin(self, conn):
+        if conn.is_closed():
+            with self._lock:
+                self.discarded += 1
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.is_closed():
+            return False
+        # Recently used sessions are trusted; idle ones get a cheap ping
+        if time.monotonic() - last_used < self.idle_check:
+            return True
+        try:
+            conn.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
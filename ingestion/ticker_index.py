@@ -0,0 +1,259 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+CACHE_DIR = os.getenv("HERA_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+INDEX_PATH = os.path.join(CACHE_DIR, "tickers.idx")
+SOURCE_URL = "https://www.sec.gov/files/company_tickers.json"
+USER_AGENT = "Hera Research hera@example.com"
+MAX_AGE = float(os.getenv("TICKER_INDEX_MAX_AGE_DAYS", "7")) * 86400
+FUZZY_CUTOFF = 0.8
+MAX_POSTINGS = 500
+
+# Names people type that SEC's registrant titles don't contain
+ALIASES = {
+    "google": "GOOGL",
+    "facebook": "META",
+    "instagram": "META",
+    "whatsapp": "META",
+    "youtube": "GOOGL",
+    "amazon com": "AMZN",
+    "walmart": "WMT",
+    "coke": "KO",
+    "coca cola": "KO",
+    "jp morgan": "JPM",
+    "jpmorgan": "JPM",
+    "chase": "JPM",
+    "berkshire": "BRK-B",
+    "disney": "DIS",
+    "mcdonalds": "MCD",
+    "tesla motors": "TSLA",
+}
+
+SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "llc", "lp",
+    "holdings", "holding", "group", "sa", "ag", "nv", "se", "the", "class", "cl", "com",
+}
+
+# File layout (little endian):
+#   header   MAGIC, version, entry count, key count, string bytes, built_at
+#   entries  (ticker offset, ticker length, name offset, name length, cik) per company
+#   keys     (key offset, key length, entry) sorted by key bytes
+#   strings  UTF-8 blob the offsets point into
+# Keys are prefixed by kind: "t:" ticker, "n:" normalized name, "a:" alias,
+# "g:" name trigram. Lookups are binary searches straight over the mmap.
+MAGIC = b"HTIX"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIII")
+ENTRY = struct.Struct("<IIIII")
+KEY = struct.Struct("<III")
+
+
+def normalize(name: str) -> str:
+    words = re.findall(r"[a-z0-9]+", name.lower().replace("&", " and ").replace("'", ""))
+    while len(words) > 1 and words[-1] in SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _intern(strings: bytearray, data: bytes) -> tuple[int, int]:
+    strings.extend(data)
+    return len(strings) - len(data), len(data)
+
+
+def build(companies: list[dict], path: str = INDEX_PATH):
+    # companies: [{"ticker", "title", "cik_str"}] in SEC's order, which puts
+    # the primary listing of a registrant first.
+    strings = bytearray()
+    entries, keys = [], []
+    for i, c in enumerate(companies):
+        ticker = str(c["ticker"]).upper()
+        name = str(c["title"])
+        entries.append((*_intern(strings, ticker.encode("utf-8")), *_intern(strings, name.encode("utf-8")), int(c["cik_str"])))
+        normalized = normalize(name)
+        keys.append((f"t:{ticker}", i))
+        keys.append((f"n:{normalized}", i))
+        keys.extend((f"g:{g}", i) for g in trigrams(normalized))
+
+    by_ticker = {str(c["ticker"]).upper(): i for i, c in reversed(list(enumerate(companies)))}
+    for alias, ticker in ALIASES.items():
+        if ticker in by_ticker:
+            keys.append((f"a:{alias}", by_ticker[ticker]))
+
+    key_rows = [(*_intern(strings, key), i) for key, i in sorted({(k.encode("utf-8"), i) for k, i in keys})]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), len(key_rows), len(strings), int(time.time())))
+        for row in entries:
+            f.write(ENTRY.pack(*row))
+        for row in key_rows:
+            f.write(KEY.pack(*row))
+        f.write(strings)
+    # Readers holding the old file keep their mapping; new ones see the new index
+    os.replace(tmp, path)
+
+
+def download() -> list[dict]:
+    import requests
+    resp = requests.get(SOURCE_URL, headers={"User-Agent": USER_AGENT}, timeout=30)
+    resp.raise_for_status()
+    return list(resp.json().values())
+
+
+def refresh(path: str = INDEX_PATH) -> int:
+    companies = download()
+    build(companies, path)
+    return len(companies)
+
+
+class TickerIndex:
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.entries, self.keys, strings_len, self.built_at = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} ticker index")
+        self._entries_at = HEADER.size
+        self._keys_at = self._entries_at + self.entries * ENTRY.size
+        self._strings_at = self._keys_at + self.keys * KEY.size
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_at + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _key(self, i: int) -> tuple[bytes, int]:
+        offset, length, entry = KEY.unpack_from(self._mm, self._keys_at + i * KEY.size)
+        start = self._strings_at + offset
+        return self._mm[start:start + length], entry
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _range(self, key: str) -> tuple[int, int]:
+        data = key.encode("utf-8")
+        return self._lower_bound(data), self._lower_bound(data + b"\x00")
+
+    def _entries_for(self, key: str) -> list[int]:
+        lo, hi = self._range(key)
+        return [self._key(i)[1] for i in range(lo, hi)]
+
+    def entry(self, i: int) -> dict:
+        t_off, t_len, n_off, n_len, cik = ENTRY.unpack_from(self._mm, self._entries_at + i * ENTRY.size)
+        return {"ticker": self._string(t_off, t_len), "company_name": self._string(n_off, n_len), "cik": cik}
+
+    def by_ticker(self, ticker: str) -> dict | None:
+        found = self._entries_for(f"t:{ticker.upper().replace('.', '-')}")
+        return self.entry(found[0]) if found else None
+
+    def by_alias(self, name: str) -> dict | None:
+        found = self._entries_for(f"a:{normalize(name)}")
+        return self.entry(min(found)) if found else None
+
+    def by_name(self, name: str, fuzzy: bool = True) -> dict | None:
+        normalized = normalize(name)
+        if not normalized:
+            return None
+        for kind in ("a", "n"):
+            found = self._entries_for(f"{kind}:{normalized}")
+            if found:
+                return self.entry(min(found))
+        return self._fuzzy(normalized) if fuzzy else None
+
+    def _fuzzy(self, normalized: str) -> dict | None:
+        # Candidates share the most trigrams with the query; the best of the
+        # shortlist by edit similarity wins if it clears FUZZY_CUTOFF.
+        from difflib import SequenceMatcher
+        ranges = sorted((self._range(f"g:{gram}") for gram in trigrams(normalized)), key=lambda r: r[1] - r[0])
+        # Grams shared by thousands of names ("  a", "co ") barely narrow the
+        # search; skip them once the rarer ones have been counted
+        counts: dict[int, int] = {}
+        for n, (lo, hi) in enumerate(ranges):
+            if hi - lo > MAX_POSTINGS and n >= 3:
+                break
+            for i in range(lo, hi):
+                entry = self._key(i)[1]
+                counts[entry] = counts.get(entry, 0) + 1
+        if not counts:
+            return None
+        shortlist = sorted(counts, key=lambda e: (-counts[e], e))[:20]
+        best, best_score = None, 0.0
+        for i in shortlist:
+            candidate = self.entry(i)
+            score = SequenceMatcher(None, normalized, normalize(candidate["company_name"])).ratio()
+            if score > best_score:
+                best, best_score = candidate, score
+        return best if best_score >= FUZZY_CUTOFF else None
+
+    def close(self):
+        self._mm.close()
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index(path: str = INDEX_PATH, max_age: float = MAX_AGE) -> TickerIndex | None:
+    # Builds the index on first use and rebuilds it once it is older than
+    # TICKER_INDEX_MAX_AGE_DAYS; an old index beats none if SEC is unreachable.
+    global _index
+    with _lock:
+        if _index is not None and _index.age() < max_age:
+            return _index
+        current = None
+        try:
+            current = TickerIndex(path)
+        except (OSError, ValueError):
+            pass
+        if current is None or current.age() >= max_age:
+            try:
+                refresh(path)
+                if current:
+                    current.close()
+                current = TickerIndex(path)
+            except Exception as e:
+                # stderr: resolve.py's stdout carries its JSON result
+                print(f"[ticker_index] Refresh failed: {e}", file=sys.stderr)
+        _index = current
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local SEC ticker index")
+    parser.add_argument("--refresh", action="store_true", help="Download company_tickers.json and rebuild the index")
+    parser.add_argument("names", nargs="*", help="Names or tickers to look up")
+    args = parser.parse_args()
+    if args.refresh:
+        print(f"Indexed {refresh()} tickers into {INDEX_PATH}")
+    index = get_index()
+    for name in args.names:
+        print(json.dumps({"input": name, **(index.by_ticker(name) or index.by_name(name) or {})}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# The JSON-lines protocol owns stdout; everything the pipeline prints goes to
+# stderr so it can't corrupt a message.
+_protocol = sys.stdout
+sys.stdout = sys.stderr
+
+import run
+from analysis_cache import AnalysisCache
+from analyzer import latest_analysis
+from loader import pool
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+
+_write_lock = threading.Lock()
+cache = AnalysisCache(latest_analysis)
+
+
+def emit(**message):
+    line = json.dumps(message, default=str)
+    with _write_lock:
+        _protocol.write(line + "\n")
+        _protocol.flush()
+
+
+def run_job(job: dict):
+    job_id = job.get("id")
+    ticker = (job.get("ticker") or "").strip().upper()
+    if not ticker:
+        emit(id=job_id, event="error", error="ticker required")
+        return
+
+    full = bool(job.get("full"))
+    on_stage = lambda stage: emit(id=job_id, event="stage", ticker=ticker, stage=stage)
+
+    def refresh_in_background():
+        # The backend keeps the job marked stale until it hears back either way
+        try:
+            result = run.process_ticker(ticker, full=full)
+        except Exception as e:
+            print(f"[worker] Background refresh of {ticker} failed: {e}")
+            emit(id=job_id, event="refreshed", ticker=ticker, ok=False, error=str(e))
+            raise
+        emit(id=job_id, event="refreshed", ticker=ticker, ok=result is not None,
+             score=result.get("accountability_score") if result else None)
+        return result
+
+    emit(id=job_id, event="started", ticker=ticker)
+    try:
+        if full:
+            result, stale = run.process_ticker(ticker, on_stage=on_stage, full=True), False
+            cache.invalidate(ticker)
+        else:
+            # A fresh cached analysis returns without touching the pipeline; an
+            # expired one is returned right away while a refresh runs behind it
+            result, stale = cache.get_or_refresh(
+                ticker,
+                lambda: run.process_ticker(ticker, on_stage=on_stage),
+                refresh_in_background,
+            )
+        emit(
+            id=job_id, event="done", ticker=ticker, ok=result is not None, stale=stale,
+            score=result.get("accountability_score") if result else None,
+        )
+    except Exception as e:
+        print(f"[worker] Job {job_id} ({ticker}) failed: {e}")
+        emit(id=job_id, event="error", ticker=ticker, error=str(e))
+
+
+def main():
+    run.warm_imports()
+    try:
+        pool.warm(1)
+    except Exception as e:
+        # Not fatal: jobs retry the login when they need the warehouse
+        print(f"[worker] Snowflake warm-up failed: {e}")
+
+    emit(event="ready", pid=os.getpid(), concurrency=WORKER_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="job") as executor:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError:
+                emit(event="error", error=f"invalid job line: {line[:200]}")
+                continue
+            if job.get("op") == "ping":
+                emit(id=job.get("id"), event="pong")
+                continue
+            emit(id=job.get("id"), event="accepted", ticker=job.get("ticker"))
+            executor.submit(run_job, job)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,9 @@ CREATE OR REPLACE TABLE raw_documents (
     document_date DATE,
     title STRING,
     content TEXT NOT NULL,
+    content_hash STRING,
+    simhash STRING,
+    sentiment FLOAT,
     metadata VARIANT,
     ingested_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
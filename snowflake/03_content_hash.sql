@@ -0,0 +1,12 @@
+USE DATABASE hera_db;
+USE SCHEMA public;
+
+-- raw_documents dedup key is (company_ticker, source_url, content_hash): an
+-- unchanged page is skipped on reload, a changed one lands as a new version.
+ALTER TABLE raw_documents ADD COLUMN IF NOT EXISTS content_hash STRING;
+
+-- Backfill rows loaded before the column existed. SHA2 over the UTF-8 text
+-- matches loader.content_hash.
+UPDATE raw_documents
+SET content_hash = SHA2(content, 256)
+WHERE content_hash IS NULL;
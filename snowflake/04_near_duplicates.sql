@@ -0,0 +1,9 @@
+USE DATABASE hera_db;
+USE SCHEMA public;
+
+-- 64-bit SimHash of the content as 16 hex digits (see ingestion/dedup.py).
+-- The loader checks new documents against these and stores near-duplicates
+-- as metadata:alternate_sources on the first copy instead of as new rows.
+-- Rows loaded before this column existed stay NULL; analysis collapses
+-- duplicates among them when it builds the prompt.
+ALTER TABLE raw_documents ADD COLUMN IF NOT EXISTS simhash STRING;
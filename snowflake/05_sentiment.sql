@@ -0,0 +1,13 @@
+USE DATABASE hera_db;
+USE SCHEMA public;
+
+-- Cortex SENTIMENT is computed once per document when it is loaded (see
+-- loader.score_sentiment) instead of over every Reddit post on each analysis.
+ALTER TABLE raw_documents ADD COLUMN IF NOT EXISTS sentiment FLOAT;
+
+-- Backfill rows loaded before the column existed. Same as
+-- `python run.py --backfill-sentiment`.
+UPDATE raw_documents
+SET sentiment = SNOWFLAKE.CORTEX.SENTIMENT(content)
+WHERE sentiment IS NULL AND source_type IN ('reddit_post')
+  AND content IS NOT NULL AND LENGTH(content) > 50;